@@ -16,7 +16,7 @@ class BaseAgent(Agent):
         if self.command.get("type") == "move":
             to = tuple(self.command.get("to", self.pos))
             if self.model.grid.out_of_bounds(to) is False:
-                self.model.grid.move_agent(self, to)
+                self.model.move_agent(self, to)
         elif self.command.get("type") == "act":
             self._do_act(self.command)
 
@@ -55,8 +55,7 @@ class MedicAgent(BaseAgent):
     def _do_act(self, cmd):
         action = cmd.get("action_name")
         if action == "pickup_survivor":
-            cell_agents = self.model.grid.get_cell_list_contents([self.pos])
-            surv = next((a for a in cell_agents if isinstance(a, Survivor)), None)
+            surv = next(iter(self.model.survivors_at(self.pos)), None)
             if surv and not self.carrying:
                 self.carrying = True
                 self.carrying_id = surv.unique_id
@@ -84,16 +83,16 @@ class TruckAgent(BaseAgent):
         action = cmd.get("action_name")
         x, y = self.pos
 
-        if action == "extinguish" and self.water > 0:
+        if action in ("extinguish", "extinguish_fire") and self.water > 0:
             if self.model.cell_type(x, y) == "fire":
                 # change the map cell and count it
-                self.model.cell_types[y][x] = "road"
+                self.model.set_cell_type(x, y, "road")
                 self.water -= 1
                 self.model.fires_extinguished += 1
 
         elif action == "clear_rubble" and self.tools > 0:
             if self.model.cell_type(x, y) == "rubble":
-                self.model.cell_types[y][x] = "road"
+                self.model.set_cell_type(x, y, "road")
                 self.tools -= 1
                 self.model.roads_cleared += 1
 
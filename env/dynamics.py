@@ -1,30 +1,73 @@
 \
-import random
+import numpy as np
+from .grid import CELL_CODES, CELL_FIRE, is_compact
+
+FLAMMABLE = ("empty","road","building","rubble")
+_FLAMMABLE_CODES = np.array([CELL_CODES[c] for c in FLAMMABLE], dtype=np.uint8)
 
 def spread_fires(model):
+    """
+    One tick of fire spread. Only the maintained frontier (model.fire_cells)
+    and its neighbours are visited, so cost follows the size of the fire,
+    not the size of the map.
+    """
+    if is_compact(model.cell_types):
+        return spread_fires_vectorized(model)
     W, H = model.width, model.height
     new_fires = []
     extinguished = 0
 
-    for y in range(H):
-        for x in range(W):
-            if model.cell_types[y][x] == "fire":
-                for dx,dy in [(1,0),(-1,0),(0,1),(0,-1)]:
-                    nx, ny = x+dx, y+dy
-                    if 0 <= nx < W and 0 <= ny < H:
-                        ct = model.cell_types[ny][nx]
-                        if ct in ("empty","road","building","rubble") and random.random() < model.p_fire_spread:
-                            new_fires.append((nx,ny))
+    # row-major order keeps the random draws in the same order as a full scan
+    for (x, y) in sorted(model.fire_cells, key=lambda c: (c[1], c[0])):
+        for dx,dy in [(1,0),(-1,0),(0,1),(0,-1)]:
+            nx, ny = x+dx, y+dy
+            if 0 <= nx < W and 0 <= ny < H:
+                ct = model.cell_types[ny][nx]
+                if ct in FLAMMABLE and model.random.random() < model.p_fire_spread:
+                    new_fires.append((nx,ny))
     for (x,y) in new_fires:
-        model.cell_types[y][x] = "fire"
+        model.set_cell_type(x, y, "fire")
     return {"extinguished": extinguished}
 
+def spread_fires_vectorized(model):
+    """
+    Whole-array version of spread_fires for compact grids, restricted to the
+    bounding box of the fire frontier plus a one-cell margin.
+    Each burning cell gives each flammable 4-neighbour an independent chance
+    p_fire_spread, so a cell with k burning neighbours ignites with
+    1 - (1 - p)^k; that is drawn once per candidate from model.np_random.
+    """
+    if not model.fire_cells:
+        return {"extinguished": 0}
+    fxs = [c[0] for c in model.fire_cells]
+    fys = [c[1] for c in model.fire_cells]
+    x0, x1 = max(min(fxs) - 1, 0), min(max(fxs) + 1, model.width - 1)
+    y0, y1 = max(min(fys) - 1, 0), min(max(fys) + 1, model.height - 1)
+    codes = model.cell_types.codes[y0:y1 + 1, x0:x1 + 1]
+    burning = codes == CELL_CODES[CELL_FIRE]
+
+    # number of burning 4-neighbours per cell (shifts, no wrap-around)
+    k = np.zeros(codes.shape, dtype=np.uint8)
+    k[1:, :] += burning[:-1, :]
+    k[:-1, :] += burning[1:, :]
+    k[:, 1:] += burning[:, :-1]
+    k[:, :-1] += burning[:, 1:]
+
+    candidates = (k > 0) & np.isin(codes, _FLAMMABLE_CODES)
+    p_ignite = 1.0 - (1.0 - model.p_fire_spread) ** k[candidates]
+    ignite = model.np_random.random(p_ignite.shape[0]) < p_ignite
+
+    ys, xs = np.nonzero(candidates)
+    for x, y in zip((xs[ignite] + x0).tolist(), (ys[ignite] + y0).tolist()):
+        model.set_cell_type(x, y, CELL_FIRE)
+    return {"extinguished": 0}
+
 def trigger_aftershocks(model):
     W, H = model.width, model.height
     roads_cleared = 0
-    if random.random() < model.p_aftershock:
-        x = random.randrange(W)
-        y = random.randrange(H)
+    if model.random.random() < model.p_aftershock:
+        x = model.random.randrange(W)
+        y = model.random.randrange(H)
         if model.cell_types[y][x] in ("road","building"):
-            model.cell_types[y][x] = "rubble"
+            model.set_cell_type(x, y, "rubble")
     return {"roads_cleared": roads_cleared}
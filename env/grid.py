@@ -0,0 +1,82 @@
+# env/grid.py
+import numpy as np
+
+CELL_ROAD = "road"
+CELL_BUILDING = "building"
+CELL_RUBBLE = "rubble"
+CELL_FIRE = "fire"
+CELL_HOSPITAL = "hospital"
+CELL_DEPOT = "depot"
+CELL_EMPTY = "empty"
+
+# Small-integer cell-type enum used by the compact (uint8) grid.
+CELL_NAMES = (CELL_EMPTY, CELL_ROAD, CELL_BUILDING, CELL_RUBBLE, CELL_FIRE, CELL_HOSPITAL, CELL_DEPOT)
+CELL_CODES = {name: code for code, name in enumerate(CELL_NAMES)}
+
+
+class _CompactRow:
+    """One row of a CompactGrid; reads/writes cell-type names like a list."""
+    __slots__ = ("_row",)
+
+    def __init__(self, row):
+        self._row = row
+
+    def __getitem__(self, x):
+        return CELL_NAMES[self._row.item(x)]
+
+    def __setitem__(self, x, name):
+        self._row[x] = CELL_CODES[name]
+
+    def __len__(self):
+        return len(self._row)
+
+    def __iter__(self):
+        return (CELL_NAMES[c] for c in self._row.tolist())
+
+
+class CompactGrid:
+    """
+    Cell-type map stored as a (height, width) uint8 array of CELL_CODES.
+    Indexing mirrors the list-of-lists layout, so `grid[y][x]` still returns
+    (and accepts) names like "fire"; hot paths should use `codes` directly.
+    """
+    def __init__(self, width, height, fill=CELL_EMPTY):
+        self.codes = np.full((height, width), CELL_CODES[fill], dtype=np.uint8)
+
+    def __getitem__(self, y):
+        return _CompactRow(self.codes[y])
+
+    def __len__(self):
+        return self.codes.shape[0]
+
+    def __iter__(self):
+        return (_CompactRow(row) for row in self.codes)
+
+    def to_lists(self):
+        return [[CELL_NAMES[c] for c in row] for row in self.codes.tolist()]
+
+
+def is_compact(cell_types):
+    return isinstance(cell_types, CompactGrid)
+
+
+def cell_window(cell_types, x0, y0, x1, y1):
+    """
+    uint8 code array for the inclusive window [x0..x1] x [y0..y1] (already
+    clipped to the map), for either grid layout. Only the window is converted
+    when the map is a list-of-lists.
+    """
+    if is_compact(cell_types):
+        return cell_types.codes[y0:y1 + 1, x0:x1 + 1]
+    return np.array(
+        [[CELL_CODES[ct] for ct in cell_types[y][x0:x1 + 1]] for y in range(y0, y1 + 1)],
+        dtype=np.uint8,
+    ).reshape(y1 - y0 + 1, x1 - x0 + 1)
+
+
+def cells_where(cell_types, name):
+    """All [x, y] cells of type `name`, in row-major order."""
+    if is_compact(cell_types):
+        ys, xs = np.nonzero(cell_types.codes == CELL_CODES[name])
+        return [[x, y] for x, y in zip(xs.tolist(), ys.tolist())]
+    return [[x, y] for y, row in enumerate(cell_types) for x, ct in enumerate(row) if ct == name]
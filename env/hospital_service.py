@@ -0,0 +1,151 @@
+# env/hospital_service.py
+from collections import deque
+
+
+class P2Quantile:
+    """
+    Streaming quantile estimate with the P-square algorithm (Jain & Chlamtac,
+    1985): five markers, O(1) memory and O(1) work per observation.
+    """
+    def __init__(self, p):
+        self.p = p
+        self._first = []       # first five observations, until the markers exist
+        self.q = None          # marker heights
+        self.n = None          # marker positions
+        self.np = None         # desired marker positions
+        self.dn = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def add(self, x):
+        if self.q is None:
+            self._first.append(x)
+            if len(self._first) == 5:
+                self.q = sorted(self._first)
+                self.n = [0, 1, 2, 3, 4]
+                p = self.p
+                self.np = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]
+            return
+        q, n = self.q, self.n
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.np[i] += self.dn[i]
+        for i in (1, 2, 3):
+            d = self.np[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                qp = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if not q[i - 1] < qp < q[i + 1]:
+                    qp = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = qp
+                n[i] += d
+
+    def value(self):
+        if self.q is not None:
+            return self.q[2]
+        if not self._first:
+            return None
+        xs = sorted(self._first)
+        return xs[min(len(xs) - 1, int(self.p * len(xs)))]
+
+
+class StreamStats:
+    """Running count/mean/variance (Welford) plus streaming p50/p95 of one series."""
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.max = None
+        self._p50 = P2Quantile(0.5)
+        self._p95 = P2Quantile(0.95)
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+        self.max = x if self.max is None else max(self.max, x)
+        self._p50.add(x)
+        self._p95.add(x)
+
+    @property
+    def variance(self):
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "var": self.variance,
+            "p50": self._p50.value(),
+            "p95": self._p95.value(),
+            "max": self.max,
+        }
+
+
+class HospitalService:
+    """
+    FIFO hospital queues (deques of (survivor_id, enqueued_tick)) served at a
+    fixed rate per tick, with bounded-memory statistics:
+      - rescue_time: tick of admission since the start of the run (the
+        model's avg_rescue_time is its mean);
+      - per hospital: wait (ticks from drop-off to admission) and queue
+        length sampled after each tick's service.
+    """
+    def __init__(self, overflow_threshold=10):
+        self.overflow_threshold = overflow_threshold
+        self.queues = {}          # {(x, y): deque[(survivor_id, enqueued_tick)]}
+        self.wait = {}            # {(x, y): StreamStats}
+        self.queue_len = {}       # {(x, y): StreamStats}
+        self.rescue_time = StreamStats()
+
+    def add_hospital(self, pos):
+        pos = tuple(pos)
+        self.queues[pos] = deque()
+        self.wait[pos] = StreamStats()
+        self.queue_len[pos] = StreamStats()
+
+    def enqueue(self, pos, survivor_id, now):
+        self.queues[tuple(pos)].append((str(survivor_id), now))
+
+    def process(self, now, rate):
+        """Serve up to `rate` patients per hospital; returns (admitted, overflow_events)."""
+        admitted = overflow = 0
+        for hpos, q in self.queues.items():
+            served = 0
+            while q and served < rate:
+                _sid, t_in = q.popleft()
+                self.wait[hpos].add(now - t_in)
+                self.rescue_time.add(now)
+                served += 1
+            admitted += served
+            self.queue_len[hpos].add(len(q))
+            if len(q) > self.overflow_threshold:
+                overflow += 1
+        return admitted, overflow
+
+    def summary(self):
+        return {
+            "rescue_time": self.rescue_time.to_dict(),
+            "hospitals": [
+                {
+                    "pos": list(pos),
+                    "queue_len_now": len(q),
+                    "wait": self.wait[pos].to_dict(),
+                    "queue_len": self.queue_len[pos].to_dict(),
+                }
+                for pos, q in self.queues.items()
+            ],
+        }
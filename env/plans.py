@@ -0,0 +1,303 @@
+# env/plans.py
+from tools.routing import manhattan, shortest_path, route_matrix
+
+MACRO_TYPES = ("route", "rescue", "clear")
+PLAN_HORIZON = 10   # default max ticks between planner calls while cached plans hold
+
+AIRBORNE = ("drone",)   # kinds that fly over fire and rubble
+HAZARD_ACTIONS = {"fire": "extinguish_fire", "rubble": "clear_rubble"}
+RETARGET = ("survivor_gone", "blocked", "target_gone")   # failures a standing order recovers from by re-picking
+
+_DIRS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+
+
+class PlanFailed(Exception):
+    """A cached plan no longer fits the world (blocked route, survivor gone, ...)."""
+
+
+class AgentPlan:
+    """
+    Multi-tick commitment for one agent, built from a macro command:
+      {"type": "route", "waypoints": [[x, y], ...], "then": <action>?, "direct": bool?}
+          walk through the waypoints (D* Lite routes avoiding fire/rubble;
+          drones, and "direct" routes of agents cut off by hazards, take
+          cached shortest_path legs straight through them instead; a blocked
+          waypoint such as a fire cell is entered from a free neighbour),
+          then optionally act there;
+      {"type": "rescue", "survivor_id": id?, "repeat": bool?}
+          walk to the survivor, pick it up, walk to the nearest hospital, drop
+          it. Without survivor_id (or with repeat) it is a standing order: the
+          agent keeps rescuing the nearest reachable unclaimed survivor;
+      {"type": "clear", "hazard": "fire"|"rubble"|"any", "target": [x, y]?}
+          standing order for trucks: extinguish / clear `target` first, then
+          the nearest reachable unclaimed hazard it has water or tools for.
+    rescue and clear take "direct" too: an agent cut off by hazards then picks
+    and reaches its targets straight through them.
+    A standing order whose target disappears picks another one, and it is
+    done once nothing is left to do (or its resources ran out).
+    The model asks next_command() once per tick for a one-step move/act
+    command; check() validates the plan against the current world without
+    issuing anything and raises PlanFailed when it cannot continue.
+    """
+    def __init__(self, cmd, issued_at=0):
+        self.agent_id = str(cmd["agent_id"])
+        self.issued_at = issued_at
+        self.kind = cmd["type"]
+        self.repeat = False
+        if self.kind == "route":
+            self.steps = [("goto", tuple(w)) for w in cmd["waypoints"]]
+            if cmd.get("then"):
+                self.steps.append(("act", cmd["then"]))
+        elif self.kind == "rescue":
+            sid = cmd.get("survivor_id")
+            self.repeat = bool(cmd.get("repeat")) or sid is None
+            self.steps = self._rescue_steps(str(sid)) if sid is not None else []
+        elif self.kind == "clear":
+            hazard = cmd.get("hazard", "any")
+            self.hazards = tuple(HAZARD_ACTIONS) if hazard == "any" else (hazard,)
+            self.repeat = True
+            self.steps = self._clear_steps(tuple(cmd["target"])) if cmd.get("target") else []
+        else:
+            raise ValueError(f"not a macro command: {cmd['type']!r}")
+        self.cmd = cmd
+        self.direct = bool(cmd.get("direct"))
+        self._leg = None   # airborne/direct: (goal, path) of the current leg, from model.path_cache
+
+    @staticmethod
+    def _rescue_steps(sid):
+        return [("goto_survivor", sid), ("act", "pickup_survivor"),
+                ("goto_hospital", None), ("act", "drop_at_hospital")]
+
+    @staticmethod
+    def _clear_steps(cell):
+        return [("goto_hazard", cell), ("act_hazard", cell)]
+
+    @property
+    def done(self):
+        return not self.steps and not self.repeat
+
+    @property
+    def target(self):
+        """What this plan is heading for, ("survivor", id) or ("cell", (x, y)), so others leave it alone."""
+        for kind, arg in self.steps:
+            if kind == "goto_survivor":
+                return ("survivor", arg)
+            if kind == "goto_hazard":
+                return ("cell", arg)
+        if self.kind == "route" and self.steps and self.steps[-1][0] == "act" and len(self.steps) > 1:
+            return ("cell", self.steps[-2][1])
+        return None
+
+    def describe(self):
+        """The macro command with its current target filled in (for the planner's state)."""
+        out = dict(self.cmd)
+        target = self.target
+        if self.kind == "rescue":
+            out["survivor_id"] = target[1] if target else None
+        elif self.kind == "clear":
+            out["target"] = list(target[1]) if target else None
+        return out
+
+    def _avoid(self, agent):
+        """Cell types this plan's legs go around (none when flying or direct)."""
+        if self.direct or getattr(agent, "kind", None) in AIRBORNE:
+            return ()
+        return ("fire", "rubble")
+
+    # ---- standing orders ----
+    def _refill(self, model, agent):
+        """Give a standing order its next job; with nothing left to do the plan is done."""
+        if self.steps or not self.repeat:
+            return
+        claimed = model.plan_targets(exclude=self.agent_id)
+        if self.kind == "rescue":
+            if getattr(agent, "carrying", False):
+                self.steps = [("goto_hospital", None), ("act", "drop_at_hospital")]
+                return
+            sid = _pick_survivor(model, agent, claimed, self._avoid(agent))
+            if sid is not None:
+                self.steps = self._rescue_steps(sid)
+                return
+        elif self.kind == "clear":
+            cell = _pick_hazard(model, agent, claimed, self.hazards, self._avoid(agent))
+            if cell is not None:
+                self.steps = self._clear_steps(cell)
+                return
+        self.repeat = False
+
+    def _run(self, model, agent, issue):
+        """check()/next_command() body; a standing order retargets once on a recoverable failure."""
+        try:
+            return self._step(model, agent, issue)
+        except PlanFailed as e:
+            if not self.repeat or str(e) not in RETARGET:
+                raise
+            self.steps = []
+            return self._step(model, agent, issue)
+
+    # ---- step targets ----
+    def _goal(self, model, agent, step):
+        kind, arg = step
+        if kind == "goto":
+            if model.cell_type(*arg) is None:
+                raise PlanFailed("out_of_bounds")
+            return arg
+        if kind == "goto_hazard":
+            if model.cell_type(*arg) not in self.hazards:
+                raise PlanFailed("target_gone")
+            return arg
+        if kind == "goto_survivor":
+            surv = model.agents_by_kind["survivor"].get(arg)
+            if surv is None or getattr(surv, "_picked", False) or getattr(surv, "_dead", False):
+                raise PlanFailed("survivor_gone")
+            return tuple(surv.pos)
+        if kind == "goto_hospital":
+            pos = tuple(agent.pos)
+            if pos in model.hospital_queues:
+                return pos
+            if self._avoid(agent) == ():
+                if not model.hospital_queues:
+                    raise PlanFailed("blocked")
+                return min(model.hospital_queues, key=lambda h: (manhattan(pos, h), h[1], h[0]))
+            target = model.distance_field("hospital").nearest_target(agent.pos)
+            if target is None:
+                raise PlanFailed("blocked")
+            return tuple(target)
+        return None
+
+    def _advance_completed(self, model, agent):
+        """Drop leading goto steps whose goal the agent already stands on."""
+        while self.steps and self.steps[0][0].startswith("goto"):
+            if tuple(agent.pos) != self._goal(model, agent, self.steps[0]):
+                return
+            self.steps.pop(0)
+
+    def _move_towards(self, model, agent, goal):
+        pos = tuple(agent.pos)
+        if manhattan(pos, goal) == 1:
+            return goal  # adjacent: step in, even onto a hazard that is the target
+        if self._avoid(agent) == ():
+            return self._leg_towards(model, pos, goal)
+        x, y = goal
+        if model.cell_type(x, y) in ("fire", "rubble"):
+            # blocked goal: route to its closest free neighbour instead
+            free = [(x + dx, y + dy) for dx, dy in _DIRS
+                    if model.cell_type(x + dx, y + dy) not in (None, "fire", "rubble")]
+            if not free:
+                raise PlanFailed("blocked")
+            goal = min(free, key=lambda c: (manhattan(pos, c), c[1], c[0]))
+        nxt = model.route_for(agent, goal).next_step()
+        if nxt is None:
+            raise PlanFailed("blocked")
+        return nxt
+
+    def _leg_towards(self, model, pos, goal):
+        """
+        Next cell of a leg that ignores hazards (flights, direct routes).
+        Nothing blocks it, so each leg is one cached shortest_path lookup from
+        where the leg starts (patrol legs repeat every lap and hit
+        model.path_cache), followed cell by cell.
+        """
+        if self._leg is None or self._leg[0] != goal or pos not in self._leg[1][:-1]:
+            res = shortest_path(model, pos, goal, avoid=())
+            if res["status"] != "ok":
+                raise PlanFailed("blocked")
+            self._leg = (goal, res["path"])
+        path = self._leg[1]
+        return path[path.index(pos) + 1]
+
+    def _hazard_action(self, model, agent):
+        """The act that clears the hazard under the agent (None if it is gone)."""
+        here = model.cell_type(*agent.pos)
+        return HAZARD_ACTIONS[here] if here in self.hazards else None
+
+    def _check_act(self, model, agent, action):
+        x, y = agent.pos
+        if action == "pickup_survivor":
+            if getattr(agent, "carrying", False) or not model.survivors_at(agent.pos):
+                raise PlanFailed("survivor_gone")
+        elif action == "drop_at_hospital":
+            if model.cell_type(x, y) != "hospital" or not getattr(agent, "carrying", False):
+                raise PlanFailed("not_at_hospital")
+        elif action in ("extinguish_fire", "extinguish"):
+            if getattr(agent, "water", 0) <= 0:
+                raise PlanFailed("no_water")
+        elif action == "clear_rubble":
+            if getattr(agent, "tools", 0) <= 0:
+                raise PlanFailed("no_tools")
+
+    def _step(self, model, agent, issue):
+        self._refill(model, agent)
+        self._advance_completed(model, agent)
+        if self.steps and self.steps[0][0] == "act_hazard":
+            action = self._hazard_action(model, agent)
+            if action is None:
+                raise PlanFailed("target_gone")
+            self._check_act(model, agent, action)
+            if issue:
+                self.steps.pop(0)
+            return {"agent_id": self.agent_id, "type": "act", "action_name": action}
+        if not self.steps:
+            return None
+        kind, arg = self.steps[0]
+        if kind == "act":
+            self._check_act(model, agent, arg)
+            if issue:
+                self.steps.pop(0)
+            return {"agent_id": self.agent_id, "type": "act", "action_name": arg}
+        nxt = self._move_towards(model, agent, self._goal(model, agent, self.steps[0]))
+        return {"agent_id": self.agent_id, "type": "move", "to": list(nxt)}
+
+    def check(self, model, agent):
+        """Validate the next step against the current world; raises PlanFailed."""
+        self._run(model, agent, issue=False)
+
+    def next_command(self, model, agent):
+        """This tick's one-step command (None when the plan is finished); raises PlanFailed."""
+        return self._run(model, agent, issue=True)
+
+
+def _pick_survivor(model, agent, claimed, avoid=("fire", "rubble")):
+    """Nearest reachable unclaimed survivor the agent can reach before its deadline (id or None)."""
+    cands = [(sid, s) for sid, s in model.agents_by_kind["survivor"].items()
+             if ("survivor", str(sid)) not in claimed
+             and not getattr(s, "_picked", False) and not getattr(s, "_dead", False)]
+    if not cands:
+        return None
+    costs = route_matrix(model, [agent.pos], [s.pos for _, s in cands], avoid=avoid)["costs"][0]
+    best = None
+    for (sid, s), c in zip(cands, costs):
+        if tuple(s.pos) == tuple(agent.pos):
+            c = 1
+        if c is None or (s.life_deadline is not None and c - 1 > s.life_deadline):
+            continue
+        key = (c, s.pos[1], s.pos[0])
+        if best is None or key < best[0]:
+            best = (key, str(sid))
+    return best[1] if best else None
+
+
+def _pick_hazard(model, agent, claimed, hazards, avoid=("fire", "rubble")):
+    """Nearest reachable unclaimed hazard cell the agent has water/tools for (or None)."""
+    kinds = [k for k in hazards
+             if (k == "fire" and getattr(agent, "water", 0) > 0) or (k == "rubble" and getattr(agent, "tools", 0) > 0)]
+    cells = sorted({c for k in kinds for c in (model.fire_cells if k == "fire" else model.rubble_cells)
+                    if ("cell", c) not in claimed}, key=lambda c: (c[1], c[0]))
+    if not cells:
+        return None
+    pos = tuple(agent.pos)
+    if pos in cells:
+        return pos
+    # hazards are blocked cells: reach a free neighbour and step in from there
+    approach = sorted({(x + dx, y + dy) for x, y in cells for dx, dy in _DIRS
+                       if model.cell_type(x + dx, y + dy) not in (None, "fire", "rubble")})
+    if not approach:
+        return None
+    costs = dict(zip(approach, route_matrix(model, [pos], approach, avoid=avoid)["costs"][0]))
+    costs[pos] = 0   # a neighbouring hazard is one step away
+    best = None
+    for x, y in cells:
+        options = [costs[(x + dx, y + dy)] for dx, dy in _DIRS if costs.get((x + dx, y + dy)) is not None]
+        if options and (best is None or (min(options), y, x) < best[0]):
+            best = ((min(options), y, x), (x, y))
+    return best[1] if best else None
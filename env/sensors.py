@@ -1,23 +1,74 @@
 \
-import random
+import numpy as np
+from .grid import CELL_CODES, CELL_FIRE, cell_window, is_compact
 
 def scan_with_noise(model, center, radius=1, fp=0.1, fn=0.1):
-    cx, cy = center
-    detections = {"fires": [], "survivors": []}
+    """Noisy scan around one centre; thin wrapper over scan_many (seeded model RNG)."""
+    det = scan_many(model, [center], radius=radius, fp=fp, fn=fn)
+    return {
+        "fires": det["fires"][:, 1:].tolist(),
+        "survivors": det["survivors"][:, 1:].tolist(),
+    }
+
+def scan_many(model, centers, radius=1, fp=0.1, fn=0.1, rng=None):
+    """
+    Batched noisy scan of (2r+1)x(2r+1) windows around many sensor centres.
+    A compact grid is sliced once (bounding box of all windows, a view);
+    a list-of-lists grid is read only at the window cells, so the cost
+    follows the sensors' coverage rather than the map size. False-positive /
+    false-negative draws for every cell of every window come from one call
+    to `rng` (default model.np_random).
+    Returns {"fires": int array (F, 3), "survivors": int array (S, 3)} with
+    rows [sensor_index, x, y], row-major within each sensor.
+    """
+    rng = model.np_random if rng is None else rng
     W, H = model.width, model.height
-    for dy in range(-radius, radius+1):
-        for dx in range(-radius, radius+1):
-            x, y = cx+dx, cy+dy
-            if 0<=x<W and 0<=y<H:
-                is_fire = (model.cell_types[y][x] == "fire")
-                if is_fire and random.random() > fn:
-                    detections["fires"].append([x,y])
-                elif (not is_fire) and random.random() < fp:
-                    detections["fires"].append([x,y])
-    for a in model.schedule.agents:
-        if getattr(a, "pos", None) and getattr(a, "life_deadline", None) is not None:
-            ax, ay = a.pos
-            if abs(ax-cx) <= radius and abs(ay-cy) <= radius:
-                if random.random() > fn:
-                    detections["survivors"].append([ax, ay])
-    return detections
+    centers = np.asarray(centers, dtype=np.int64).reshape(-1, 2)
+    empty = np.zeros((0, 3), dtype=np.int64)
+    if len(centers) == 0:
+        return {"fires": empty, "survivors": empty}
+
+    # window coordinates, shape (N, K) with K = (2r+1)^2 in row-major order
+    dy, dx = np.mgrid[-radius:radius+1, -radius:radius+1]
+    xs = centers[:, :1] + dx.ravel()[None, :]
+    ys = centers[:, 1:] + dy.ravel()[None, :]
+    valid = (xs >= 0) & (xs < W) & (ys >= 0) & (ys < H)
+
+    is_fire = np.zeros(xs.shape, dtype=bool)
+    if valid.any() and is_compact(model.cell_types):
+        bx0, bx1 = int(xs[valid].min()), int(xs[valid].max())
+        by0, by1 = int(ys[valid].min()), int(ys[valid].max())
+        fire = cell_window(model.cell_types, bx0, by0, bx1, by1) == CELL_CODES[CELL_FIRE]
+        is_fire[valid] = fire[ys[valid] - by0, xs[valid] - bx0]
+    elif valid.any():
+        rows = model.cell_types
+        is_fire[valid] = [rows[y][x] == CELL_FIRE for x, y in zip(xs[valid].tolist(), ys[valid].tolist())]
+
+    u = rng.random(xs.shape)
+    fire_det = valid & np.where(is_fire, u > fn, u < fp)
+    sensor, k = np.nonzero(fire_det)
+    fires = np.stack([sensor, xs[sensor, k], ys[sensor, k]], axis=1)
+
+    # survivors: only occupied cells inside each window (survivor_cells index)
+    cells = model.survivor_cells
+    found = []
+    for i, (cx, cy) in enumerate(centers.tolist()):
+        x0, y0 = max(cx-radius, 0), max(cy-radius, 0)
+        x1, y1 = min(cx+radius, W-1), min(cy+radius, H-1)
+        if (2*radius+1)**2 <= len(cells):
+            hits = [(x, y) for y in range(y0, y1+1) for x in range(x0, x1+1) if (x, y) in cells]
+        else:
+            hits = sorted((c for c in cells if x0 <= c[0] <= x1 and y0 <= c[1] <= y1),
+                          key=lambda c: (c[1], c[0]))
+        for (x, y) in hits:
+            found.extend([i, x, y] for _ in cells[(x, y)])
+    if not found:
+        return {"fires": fires, "survivors": empty}
+    found = np.asarray(found, dtype=np.int64)
+    survivors = found[rng.random(len(found)) > fn]
+    return {"fires": fires, "survivors": survivors}
+
+def scan_drones(model, radius=1, fp=0.1, fn=0.1):
+    """scan_many over every drone in the fleet; sensor_index follows agents_by_kind["drone"]."""
+    drones = list(model.agents_by_kind["drone"].values())
+    return scan_many(model, [a.pos for a in drones], radius=radius, fp=fp, fn=fn)
@@ -4,27 +4,36 @@ from mesa.space import MultiGrid
 from mesa.time import SimultaneousActivation
 from mesa.datacollection import DataCollector
 import random
-from collections import deque
+import numpy as np
+from collections import defaultdict
 from .agents import DroneAgent, MedicAgent, TruckAgent, Survivor
 from env.agents import Survivor, MedicAgent
 
 from .dynamics import spread_fires, trigger_aftershocks
-
-CELL_ROAD = "road"
-CELL_BUILDING = "building"
-CELL_RUBBLE = "rubble"
-CELL_FIRE = "fire"
-CELL_HOSPITAL = "hospital"
-CELL_DEPOT = "depot"
-CELL_EMPTY = "empty"
+from .hospital_service import HospitalService
+from .plans import AgentPlan, PlanFailed, MACRO_TYPES, PLAN_HORIZON
+from tools.routing import PathCache
+from tools.distance_field import DistanceField
+from tools.dstar_lite import DStarLiteRoute
+from .grid import (
+    CELL_ROAD, CELL_BUILDING, CELL_RUBBLE, CELL_FIRE, CELL_HOSPITAL, CELL_DEPOT, CELL_EMPTY,
+    CompactGrid, cells_where,
+)
+
+def _row_major(cell):
+    return (cell[1], cell[0])
 
 class CrisisModel(Model):
     """
     Mesa model containing the world grid, agents, and per-tick dynamics.
     Reasoning/planning is orchestrated by main.py; this model exposes helpers
     to summarize state and to apply per-tick plans.
+
+    With `compact_grid=True` (or `compact_grid: true` in the map config) the map
+    is a CompactGrid (uint8 codes) instead of a list-of-lists of strings;
+    `cell_types[y][x]` and `cell_type(x, y)` behave the same in both modes.
     """
-    def __init__(self, width, height, rng_seed=42, config=None, render=False):
+    def __init__(self, width, height, rng_seed=42, config=None, render=False, compact_grid=None):
         super().__init__()
         self.random = random.Random(rng_seed)
         self.width = width
@@ -39,11 +48,11 @@ class CrisisModel(Model):
         self.p_fire_spread = 0.15
         self.p_aftershock = 0.02
         self.hospital_service_rate = 2  # patients per tick per hospital
-        self.hospital_queues = {}  # {(x,y): [survivor_ids...]}
+        self.hospital_service = HospitalService(overflow_threshold=10)
+        self.hospital_queues = self.hospital_service.queues  # {(x,y): deque[(survivor_id, enqueued_tick)]}
         # Timing / rescue-time tracking
         self.time = 0                      # simulation ticks since start
-        self._rescue_times = []            # list of tick-times when survivors get admitted
-        self.avg_rescue_time = 0.0         # rolling average (in ticks)
+        self.avg_rescue_time = 0.0         # running mean of admission tick (see hospital_service)
 
         # Metrics (some are placeholders for extension)
         self.rescued = 0
@@ -57,18 +66,39 @@ class CrisisModel(Model):
         self.hospital_overflow_events = 0
 
         # Map
-        self.cell_types = [[CELL_EMPTY for _ in range(width)] for _ in range(height)]
+        if compact_grid is None:
+            compact_grid = bool((config or {}).get("compact_grid", False))
+        self.compact_grid = compact_grid
+        # Maintained cell indexes; kept in sync by set_cell_type()
+        self.fire_cells = set()    # {(x, y)} currently burning (the fire frontier)
+        self.rubble_cells = set()  # {(x, y)} currently rubble
+        self.path_cache = PathCache()  # shortest_path memo, invalidated in set_cell_type()
+        self.distance_fields = {}      # {"hospital"|"depot": DistanceField}, built on first use
+        self.routes = {}               # {agent_id: DStarLiteRoute}, repaired on cell changes
+        if compact_grid:
+            self.cell_types = CompactGrid(width, height)
+        else:
+            self.cell_types = [[CELL_EMPTY for _ in range(width)] for _ in range(height)]
         self._init_from_config(config or {})
 
+        # Agent indexes, kept in sync by _add_agent / move_agent / _remove_agent
+        self.agent_index = {}                     # {agent_id: agent}
+        self.agents_by_kind = defaultdict(dict)   # {"medic"|...|"survivor": {agent_id: agent}}
+        self.responders = {}                      # {agent_id: agent} non-survivors, spawn order
+        self.survivor_cells = defaultdict(dict)   # {(x, y): {agent_id: Survivor}}
+
         # Agents
         self._spawn_initial_agents()
         self._place_survivors(config.get("survivors", 10))
         # Cache how many survivors were spawned at start (fallback to None if types differ)
         try:
-            self.total_survivors = sum(1 for a in self.schedule.agents if isinstance(a, Survivor))
+            self.total_survivors = len(self.agents_by_kind["survivor"])
         except Exception:
             self.total_survivors = None  # we'll infer on the first step if needed
 
+        # Array RNG for vectorized dynamics, derived from the seeded model RNG
+        self.np_random = np.random.default_rng(self.random.getrandbits(64))
+
         # DataCollector
         self.datacollector = DataCollector(model_reporters={
             "rescued": "rescued",
@@ -84,17 +114,27 @@ class CrisisModel(Model):
 
         # Plan from planner applied each tick
         self.pending_commands = []  # list of {"agent_id": str, "type": "move|act", ...}
+        # Multi-tick plans (route/rescue macros) kept across ticks, see env/plans.py
+        self.agent_plans = {}       # {agent_id: AgentPlan}
+        self.plan_failures = []     # [(agent_id, reason)] since the last set_plan()
+        self.replan_due = set()     # agents whose plan finished or failed, or whose one-step command ran
+        self.planned_at = None      # tick of the last full set_plan()
 
     def _init_from_config(self, cfg):
         W, H = self.width, self.height
         # Default: everything road except explicit types
-        for y in range(H):
-            for x in range(W):
-                self.cell_types[y][x] = CELL_ROAD
+        if self.compact_grid:
+            self.cell_types = CompactGrid(W, H, fill=CELL_ROAD)
+        else:
+            for y in range(H):
+                for x in range(W):
+                    self.cell_types[y][x] = CELL_ROAD
+        self.fire_cells.clear()
+        self.rubble_cells.clear()
 
         def set_cell(x, y, val):
             if 0 <= x < W and 0 <= y < H:
-                self.cell_types[y][x] = val
+                self.set_cell_type(x, y, val)
 
         depot = cfg.get("depot", [1,1])
         set_cell(depot[0], depot[1], CELL_DEPOT)
@@ -102,7 +142,7 @@ class CrisisModel(Model):
 
         for h in cfg.get("hospitals", []):
             set_cell(h[0], h[1], CELL_HOSPITAL)
-            self.hospital_queues[tuple(h)] = []
+            self.hospital_service.add_hospital(h)
 
         for r in cfg.get("rubble", []):
             set_cell(r[0], r[1], CELL_RUBBLE)
@@ -122,8 +162,7 @@ class CrisisModel(Model):
         t = TruckAgent(self.next_id(), self, mode="water", water_max=30, tools_max=10)
 
         for a in (d, m1, m2, t):
-            self.schedule.add(a)
-            self.grid.place_agent(a, self.depot)
+            self._add_agent(a, self.depot)
 
     def _place_survivors(self, n):
         placed = 0
@@ -134,15 +173,147 @@ class CrisisModel(Model):
             ct = self.cell_types[y][x]
             if ct in (CELL_BUILDING, CELL_RUBBLE, CELL_ROAD, CELL_EMPTY):
                 s = Survivor(self.next_id(), self, life_deadline=self.random.randint(120, 260))
-                self.schedule.add(s)
-                self.grid.place_agent(s, (x, y))
+                self._add_agent(s, (x, y))
                 placed += 1
             attempts += 1
 
+    # ----------------- Agent bookkeeping -----------------
+    def _add_agent(self, agent, pos):
+        self.schedule.add(agent)
+        self.grid.place_agent(agent, pos)
+        aid = str(agent.unique_id)
+        self.agent_index[aid] = agent
+        if isinstance(agent, Survivor):
+            self.agents_by_kind["survivor"][aid] = agent
+            self.survivor_cells[tuple(pos)][aid] = agent
+        else:
+            self.agents_by_kind[getattr(agent, "kind", "unknown")][aid] = agent
+            self.responders[aid] = agent
+
+    def move_agent(self, agent, pos):
+        pos = tuple(pos)
+        if isinstance(agent, Survivor):
+            self._unindex_survivor(agent)
+            self.survivor_cells[pos][str(agent.unique_id)] = agent
+        self.grid.move_agent(agent, pos)
+
+    def _unindex_survivor(self, agent):
+        cell = self.survivor_cells.get(tuple(agent.pos))
+        if cell is not None:
+            cell.pop(str(agent.unique_id), None)
+            if not cell:
+                del self.survivor_cells[tuple(agent.pos)]
+
+    def _remove_agent(self, agent):
+        aid = str(agent.unique_id)
+        if isinstance(agent, Survivor):
+            self._unindex_survivor(agent)
+            self.agents_by_kind["survivor"].pop(aid, None)
+        else:
+            self.agents_by_kind[getattr(agent, "kind", "unknown")].pop(aid, None)
+            self.responders.pop(aid, None)
+        self.agent_index.pop(aid, None)
+        try:
+            self.grid.remove_agent(agent)
+        except Exception:
+            pass
+        try:
+            self.schedule.remove(agent)
+        except Exception:
+            pass
+
+    def survivors_at(self, pos):
+        """Survivors standing on `pos` (O(1) via survivor_cells)."""
+        return list(self.survivor_cells.get(tuple(pos), {}).values())
+
     # ----------------- Per-tick orchestration -----------------
-    def set_plan(self, commands):
-        """Accept list of per-agent command dicts generated by planner."""
-        self.pending_commands = commands or []
+    def set_plan(self, commands, agents=None):
+        """
+        Accept list of per-agent command dicts generated by planner. Macro
+        commands (route/rescue) replace the agent's cached multi-tick plan;
+        a one-step move/act overrides it and, being done after one tick, puts
+        the agent up for replanning. Agents the planner leaves out keep their
+        cached plan. With `agents` (see agents_to_replan) only commands for
+        those agents are applied; every other agent keeps its plan. A call
+        after a cached plan failed counts as a replan.
+        """
+        if self.plan_failures:
+            self.replans += 1
+        self.plan_failures = []
+        if agents is None:
+            self.planned_at = self.time
+            self.replan_due = set()
+        else:
+            agents = {str(a) for a in agents}
+            self.replan_due -= agents
+        self.pending_commands = []
+        for cmd in commands or []:
+            aid = str(cmd.get("agent_id"))
+            if agents is not None and aid not in agents:
+                continue
+            if cmd.get("type") in MACRO_TYPES:
+                self.agent_plans[aid] = AgentPlan(cmd, issued_at=self.time)
+            else:
+                self.agent_plans.pop(aid, None)
+                self.pending_commands.append(cmd)
+                self.replan_due.add(aid)   # a one-step command is a plan that ends with this tick
+
+    def agents_to_replan(self, horizon=None):
+        """
+        Which agents the planner should (re)plan this tick: None for all of
+        them (first plan, no cached plans, or `horizon` ticks since the last
+        full plan), else the sorted ids whose plan finished or failed or whose
+        one-step command ran - an empty list means no planner call is needed.
+        """
+        if (self.planned_at is None or not self.agent_plans
+                or (horizon is not None and self.time - self.planned_at >= horizon)):
+            return None
+        return sorted(self.replan_due)
+
+    def plan_targets(self, exclude=None):
+        """Targets of the cached plans (see AgentPlan.target), except agent `exclude`'s."""
+        return {plan.target for aid, plan in self.agent_plans.items() if aid != exclude} - {None}
+
+    def needs_replan(self, horizon=None):
+        """Whether the planner should run this tick (for any agent)."""
+        return self.agents_to_replan(horizon) != []
+
+    def _plan_commands(self, cmd_map):
+        """One-step commands from cached plans for agents without an explicit command this tick."""
+        for aid, plan in list(self.agent_plans.items()):
+            agent = self.responders.get(aid)
+            if agent is None:
+                del self.agent_plans[aid]
+                continue
+            if aid in cmd_map:
+                continue
+            try:
+                cmd = plan.next_command(self, agent)
+            except PlanFailed as e:
+                del self.agent_plans[aid]
+                self.plan_failures.append((aid, str(e)))
+                self.replan_due.add(aid)
+                continue
+            if cmd is not None:
+                cmd_map[aid] = cmd
+
+    def _validate_plans(self):
+        """Drop cached plans that finished or no longer fit the world (after the world moved on)."""
+        for aid, plan in list(self.agent_plans.items()):
+            agent = self.responders.get(aid)
+            try:
+                if agent is None:
+                    raise PlanFailed("agent_gone")
+                plan.check(self, agent)
+            except PlanFailed as e:
+                del self.agent_plans[aid]
+                self.plan_failures.append((aid, str(e)))
+                if agent is not None:
+                    self.replan_due.add(aid)
+                continue
+            if plan.done:
+                del self.agent_plans[aid]
+                self.replan_due.add(aid)
     def step(self):
         """Apply pending plan, update dynamics, and collect metrics."""
         # --- Apply planner commands to agents for this tick ---
@@ -154,39 +325,12 @@ class CrisisModel(Model):
             except Exception:
                 mock_react_with_tools = None
 
-            if mock_react_with_tools is not None:
+            scope = self.agents_to_replan(PLAN_HORIZON)
+            if mock_react_with_tools is not None and scope != []:
                 # export a context dict like the one used in headless runs
-                ctx = self.export_state() if hasattr(self, "export_state") else {
-                    "grid": {"w": self.width, "h": self.height},
-                    "depot": list(self.depot),
-                    "agents": [
-                        {
-                            "id": str(a.unique_id),
-                            "kind": getattr(a, "kind", "unknown"),
-                            "pos": list(a.pos),
-                            "battery": getattr(a, "battery", None),
-                            "water": getattr(a, "water", None),
-                            "tools": getattr(a, "tools", None),
-                            "carrying": getattr(a, "carrying", False),
-                        }
-                        for a in self.schedule.agents
-                    ],
-                    "hospitals": [{"pos": list(k)} for k in self.hospital_queues.keys()],
-                    "fires": [
-                        [x, y] for y in range(self.height) for x in range(self.width)
-                        if self.cell_type(x, y) == "fire" or self.cell_type(x, y) == CELL_FIRE
-                    ],
-                    "rubble": [
-                        [x, y] for y in range(self.height) for x in range(self.width)
-                        if self.cell_type(x, y) == "rubble" or self.cell_type(x, y) == CELL_RUBBLE
-                    ],
-                    "survivors": [
-                        {"id": str(a.unique_id), "pos": list(a.pos), "deadline": getattr(a, "deadline", 999)}
-                        for a in self.schedule.agents if a.__class__.__name__ == "Survivor"
-                    ],
-                }
+                ctx = self.export_state() if hasattr(self, "export_state") else self.summarize_state()
                 plan = mock_react_with_tools(ctx)
-                self.pending_commands = plan.get("commands", [])
+                self.set_plan(plan.get("commands", []), agents=scope)
         # --- end auto-plan block ---
 
         # existing code that maps self.pending_commands to each agent, then:
@@ -199,10 +343,10 @@ class CrisisModel(Model):
             aid = cmd.get("agent_id")
             if aid is not None:
                 cmd_map[aid] = cmd
-        for agent in self.schedule.agents:
+        self._plan_commands(cmd_map)
+        for aid, agent in self.responders.items():
             if hasattr(agent, "set_command"):
-                acmd = cmd_map.get(str(agent.unique_id))
-                agent.set_command(acmd)
+                agent.set_command(cmd_map.get(aid))
 
         # --- Run one scheduler cycle (SimultaneousActivation: step() then advance()) ---
         self.schedule.step()
@@ -219,22 +363,14 @@ class CrisisModel(Model):
         # === DEFERRED REMOVALS ===
         # Remove survivors that were picked up (flagged) or died this tick.
         to_remove = []
-        for a in list(self.schedule.agents):
-            if isinstance(a, Survivor):
-                if getattr(a, "_dead", False):
-                    self.deaths += 1
-                    to_remove.append(a)
-                elif getattr(a, "_picked", False):
-                    to_remove.append(a)
+        for a in self.agents_by_kind["survivor"].values():
+            if getattr(a, "_dead", False):
+                self.deaths += 1
+                to_remove.append(a)
+            elif getattr(a, "_picked", False):
+                to_remove.append(a)
         for a in to_remove:
-            try:
-                self.grid.remove_agent(a)
-            except Exception:
-                pass
-            try:
-                self.schedule.remove(a)
-            except Exception:
-                pass
+            self._remove_agent(a)
         # === end deferred removals ===
 
         # --- Metrics collection ---
@@ -242,15 +378,16 @@ class CrisisModel(Model):
 
         # --- Clear the applied plan for next tick ---
         self.pending_commands = []
+        self._validate_plans()
         # --- Stop conditions ---
         # a) stop if no survivors remain (rescued + deaths = total)
         total_spawned = getattr(self, "total_survivors", None)
         # compute total once
         if self.total_survivors is None:
             self.total_survivors = (
-                sum(1 for a in self.schedule.agents if a.__class__.__name__ == "Survivor")
+                len(self.agents_by_kind["survivor"])
                 + sum(len(q) for q in self.hospital_queues.values())
-                + sum(1 for a in self.schedule.agents if a.__class__.__name__ == "MedicAgent" and getattr(a, "carrying", False))
+                + sum(1 for a in self.agents_by_kind["medic"].values() if getattr(a, "carrying", False))
                 + self.rescued + self.deaths
             )
 
@@ -267,29 +404,22 @@ class CrisisModel(Model):
     def _process_hospital_queues(self):
         """
         Each tick, every hospital serves up to `hospital_service_rate` survivors (FIFO).
-        Records time-to-admission in ticks and updates avg_rescue_time.
+        Admission times, waits and queue lengths are tracked by hospital_service.
         """
         rate = int(self.hospital_service_rate) if self.hospital_service_rate is not None else 0
-        for hpos, q in self.hospital_queues.items():
-            served = 0
-            while q and served < rate:
-                _sid = q.pop(0)  # FIFO list
-                self.rescued += 1
-                # record this admission time (ticks since start)
-                self._rescue_times.append(self.time)
-                # update rolling average
-                self.avg_rescue_time = (
-                    sum(self._rescue_times) / float(len(self._rescue_times))
-                )
-                served += 1
-            if len(q) > 10:
-                self.hospital_overflow_events += 1
-
+        admitted, overflow = self.hospital_service.process(self.time, rate)
+        self.rescued += admitted
+        self.hospital_overflow_events += overflow
+        if self.hospital_service.rescue_time.count:
+            self.avg_rescue_time = self.hospital_service.rescue_time.mean
 
+    def hospital_stats(self):
+        """Streaming rescue-time / wait / queue-length statistics per hospital."""
+        return self.hospital_service.summary()
 
     def summarize_state(self):
         agents = []
-        for a in self.schedule.agents:
+        for a in self.responders.values():
             if hasattr(a, "kind"):
                 agents.append({
                     "id": str(a.unique_id),
@@ -300,16 +430,16 @@ class CrisisModel(Model):
                     "tools": getattr(a, "tools", None),
                     "carrying": getattr(a, "carrying", False),
                 })
+                plan = self.agent_plans.get(str(a.unique_id))
+                # the multi-tick command the agent is executing; always present so every state has one schema
+                agents[-1]["plan"] = plan.describe() if plan is not None else None
         hospitals = [{"pos": list(pos), "queue_len": len(q)} for pos, q in self.hospital_queues.items()]
-        fires, rubble, survivors = [], [], []
-        for y in range(self.height):
-            for x in range(self.width):
-                ct = self.cell_types[y][x]
-                if ct == CELL_FIRE: fires.append([x,y])
-                if ct == CELL_RUBBLE: rubble.append([x,y])
-        for a in self.schedule.agents:
-            if isinstance(a, Survivor):
-                survivors.append({"id": str(a.unique_id), "pos": list(a.pos), "deadline": a.life_deadline})
+        fires = [[x, y] for (x, y) in sorted(self.fire_cells, key=_row_major)]
+        rubble = [[x, y] for (x, y) in sorted(self.rubble_cells, key=_row_major)]
+        survivors = [
+            {"id": sid, "pos": list(a.pos), "deadline": a.life_deadline}
+            for sid, a in self.agents_by_kind["survivor"].items()
+        ]
 
         return {
             "grid": {"w": self.width, "h": self.height},
@@ -335,43 +465,101 @@ class CrisisModel(Model):
         if 0 <= x < self.width and 0 <= y < self.height:
             return self.cell_types[y][x]
         return None
+
+    def set_cell_type(self, x, y, val):
+        """
+        Change one map cell and keep the fire/rubble indexes in sync.
+        All map mutations (config, fire spread, aftershocks, truck actions)
+        should go through here; returns the previous cell type.
+        """
+        old = self.cell_types[y][x]
+        if old == val:
+            return old
+        self.cell_types[y][x] = val
+        cell = (x, y)
+        if old == CELL_FIRE:
+            self.fire_cells.discard(cell)
+        elif old == CELL_RUBBLE:
+            self.rubble_cells.discard(cell)
+        if val == CELL_FIRE:
+            self.fire_cells.add(cell)
+        elif val == CELL_RUBBLE:
+            self.rubble_cells.add(cell)
+        self.path_cache.on_cell_changed(x, y, old, val)
+        for field in self.distance_fields.values():
+            field.on_cell_changed(x, y, old, val)
+        for route in self.routes.values():
+            route.on_cell_changed(x, y, old, val)
+        return old
+
+    def rebuild_cell_index(self):
+        """Recompute fire/rubble indexes after writing cell_types directly."""
+        self.fire_cells = {tuple(c) for c in cells_where(self.cell_types, CELL_FIRE)}
+        self.rubble_cells = {tuple(c) for c in cells_where(self.cell_types, CELL_RUBBLE)}
+        self.path_cache.clear()
+        for field in self.distance_fields.values():
+            field.rebuild()
+        self.routes.clear()
+
+    def distance_field(self, kind):
+        """
+        BFS distance field to the nearest hospital ("hospital") or to the depot
+        ("depot"); built on first use, then updated incrementally on cell changes.
+        """
+        if kind not in self.distance_fields:
+            if kind == "hospital":
+                targets = list(self.hospital_queues.keys())
+            elif kind == "depot":
+                targets = [self.depot]
+            else:
+                return None
+            self.distance_fields[kind] = DistanceField(self, targets)
+        return self.distance_fields[kind]
+
+    def route_for(self, agent, goal, avoid=("fire", "rubble")):
+        """
+        Persistent D* Lite route from the agent's position to `goal`. Reused
+        (and repaired incrementally) while the goal stays the same; a new goal
+        starts a new search.
+        """
+        key = str(agent.unique_id)
+        route = self.routes.get(key)
+        if route is None or route.goal != tuple(goal) or route.avoid != frozenset(avoid):
+            route = DStarLiteRoute(self, agent.pos, goal, avoid)
+            self.routes[key] = route
+        else:
+            route.update_start(agent.pos)
+        return route
+
+    def drop_route(self, agent_id):
+        self.routes.pop(str(agent_id), None)
+
+    def routing_stats(self):
+        """Path-cache hit/miss counters (reported by run_episode / eval harness)."""
+        return self.path_cache.stats()
     def add_to_hospital_queue(self, pos, survivor_id: str):
         """
         Enqueue a survivor at the hospital located at `pos` (x,y).
-        If the exact pos is not a hospital key, fallback to the nearest hospital.
+        If the exact pos is not a hospital key, fallback to the nearest reachable
+        hospital (distance field), or the nearest by Manhattan distance if none is.
         """
         key = tuple(pos)
         if key not in self.hospital_queues:
-            # fallback to nearest hospital by Manhattan distance
             if not self.hospital_queues:
                 return
-            px, py = key
-            nearest = min(
-                self.hospital_queues.keys(),
-                key=lambda hp: abs(hp[0] - px) + abs(hp[1] - py)
-            )
+            nearest = self.distance_field("hospital").nearest_target(key)
+            if nearest is None:
+                px, py = key
+                nearest = min(
+                    self.hospital_queues.keys(),
+                    key=lambda hp: abs(hp[0] - px) + abs(hp[1] - py)
+                )
             key = nearest
-        self.hospital_queues[key].append(str(survivor_id))
+        self.hospital_service.enqueue(key, survivor_id, self.time)
 
 
-    def _process_hospital_queues(self):
-        """
-        Each tick, every hospital serves up to `hospital_service_rate` survivors (FIFO).
-        Increments self.rescued and optionally tracks overflow.
-        """
-        rate = int(self.hospital_service_rate) if self.hospital_service_rate is not None else 0
-        for hpos, q in self.hospital_queues.items():
-            served = 0
-            while q and served < rate:
-                _sid = q.pop(0)  # FIFO list
-                self.rescued += 1
-                served += 1
-            if len(q) > 10:
-                self.hospital_overflow_events += 1
-
-
-        def is_blocked(self, x, y):
-            return self.cell_type(x,y) in (CELL_FIRE, CELL_RUBBLE, CELL_BUILDING)
+    def is_blocked(self, x, y):
+        return self.cell_type(x,y) in (CELL_FIRE, CELL_RUBBLE, CELL_BUILDING)
 
 import yaml, os
 
@@ -1,22 +1,73 @@
 # eval/aggregate.py
-import json, os, csv
-
-RAW = "results/raw"
-OUTDIR = "results/agg"
-os.makedirs(OUTDIR, exist_ok=True)
-rows = []
-for fn in os.listdir(RAW):
-    if not fn.endswith(".json"): continue
-    with open(os.path.join(RAW, fn), "r", encoding="utf-8") as f:
-        rows.append(json.load(f))
-
-cols = ["run_id","map","strategy","seed","ticks","rescued","deaths",
+import argparse, json, os, csv, sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from eval.store import code_version
+
+COLS = ["run_id","map","strategy","provider","seed","ticks","code_version","rescued","deaths",
         "avg_rescue_time","fires_extinguished","roads_cleared","energy_used",
         "tool_calls","invalid_json","replans","hospital_overflow_events"]
 
-with open(os.path.join(OUTDIR, "summary.csv"), "w", newline="", encoding="utf-8") as f:
-    w = csv.DictWriter(f, fieldnames=cols)
-    w.writeheader()
-    for r in rows:
-        w.writerow({c: r.get(c, "") for c in cols})
-print(f"Wrote {len(rows)} rows -> results/agg/summary.csv")
+def main():
+    """
+    Merge episode JSON files from results/raw into results/agg/summary.csv.
+    A manifest of already-merged files (name -> size/mtime) lets repeated runs
+    append only new episodes; if a merged file changed or disappeared, or the
+    summary has other columns, it is rebuilt from scratch. Each row carries
+    the code_version its episode ran with; --code_version keeps one version.
+    """
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--raw", type=str, default="results/raw")
+    ap.add_argument("--out", type=str, default="results/agg")
+    ap.add_argument("--rebuild", action="store_true")
+    ap.add_argument("--code_version", type=str, default=None,
+                    help="merge only episodes of this code version ('current' = eval.store.code_version())")
+    args = ap.parse_args()
+    os.makedirs(args.out, exist_ok=True)
+    summary = os.path.join(args.out, "summary.csv")
+    manifest_path = os.path.join(args.out, "manifest.json")
+
+    manifest = {}
+    version = code_version() if args.code_version == "current" else args.code_version
+    if not args.rebuild and os.path.exists(manifest_path) and os.path.exists(summary):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        with open(summary, "r", newline="", encoding="utf-8") as f:
+            header = next(csv.reader(f), None)
+        if header != COLS or manifest.pop("__code_version__", None) != version:
+            manifest = {}  # other columns or version filter: rebuild
+
+    current = {}
+    for fn in os.listdir(args.raw) if os.path.isdir(args.raw) else []:
+        if not fn.endswith(".json"): continue
+        st = os.stat(os.path.join(args.raw, fn))
+        current[fn] = [st.st_size, st.st_mtime_ns]
+
+    if any(current.get(fn) != sig for fn, sig in manifest.items()):
+        manifest = {}  # merged files changed: rebuild
+    new = sorted(fn for fn in current if fn not in manifest)
+
+    mode = "a" if manifest else "w"
+    written = 0
+    with open(summary, mode, newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=COLS)
+        if mode == "w":
+            w.writeheader()
+        for fn in new:
+            with open(os.path.join(args.raw, fn), "r", encoding="utf-8") as rf:
+                r = json.load(rf)
+            manifest[fn] = current[fn]
+            if version is not None and r.get("code_version") != version:
+                continue
+            w.writerow({c: r.get(c, "") for c in COLS})
+            written += 1
+
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(dict(manifest, __code_version__=version), f)
+    print(f"Merged {written} new rows ({len(manifest)} episode files seen) -> {summary}")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,120 @@
 \
-import argparse, os, json, csv
+import argparse, os, sys, json, csv
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from tqdm import trange
-from ..main import run_episode
+from tqdm import tqdm
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from main import run_episode, run_lockstep
+from eval.store import EpisodeStore, code_version
+from eval.results_db import ResultsDB
+
+FIELDNAMES = ["seed","provider","strategy","map","rescued","deaths","avg_rescue_time","fires_extinguished",
+              "roads_cleared","energy_used","tool_calls","invalid_json","replans","hospital_overflow_events","crisis_score",
+              "path_cache_hits","path_cache_misses"]
+
+def parse_condition(cond):
+    """'react_reflexion_mock' -> (provider, strategy); 'hybrid_react_groq' -> ('groq', 'hybrid_react')"""
+    if "gemini" in cond:
+        provider = "gemini"
+    elif "groq" in cond:
+        provider = "groq"
+    else:
+        provider = "mock"
+    if "heuristic" in cond:
+        strategy = "heuristic"
+    elif "react_reflexion" in cond:
+        strategy = "react_reflexion"
+    elif "plan_execute" in cond:
+        strategy = "plan_execute"
+    else:
+        strategy = "react"
+    if cond.startswith("hybrid_") and strategy != "heuristic":
+        strategy = "hybrid_" + strategy
+    return provider, strategy
+
+def _episode_kwargs(job):
+    mappath, cond, seed, ticks = job["map"], job["cond"], job["seed"], job["ticks"]
+    provider, strategy = parse_condition(cond)
+    log_path = f"logs/seed_{seed}_{Path(mappath).stem}_{cond}.jsonl"
+    return dict(map_path=mappath, seed=seed, ticks=ticks, provider=provider, strategy=strategy, log_path=log_path,
+                render=False, with_history=True)
+
+def _result(job, metrics):
+    provider, strategy = parse_condition(job["cond"])
+    row = {
+        "seed": job["seed"],
+        "provider": provider,
+        "strategy": strategy,
+        "map": Path(job["map"]).stem,
+        "rescued": metrics.get("rescued",0),
+        "deaths": metrics.get("deaths",0),
+        "avg_rescue_time": metrics.get("avg_rescue_time",0.0),
+        "fires_extinguished": metrics.get("fires_extinguished",0),
+        "roads_cleared": metrics.get("roads_cleared",0),
+        "energy_used": metrics.get("energy_used",0),
+        "tool_calls": metrics.get("tool_calls",0),
+        "invalid_json": metrics.get("invalid_json",0),
+        "replans": metrics.get("replans",0),
+        "hospital_overflow_events": metrics.get("hospital_overflow_events",0),
+        "path_cache_hits": metrics.get("path_cache_hits",0),
+        "path_cache_misses": metrics.get("path_cache_misses",0),
+    }
+    row["crisis_score"] = 3*row["rescued"] - 2*row["deaths"] + 1*row["fires_extinguished"] + 0.5*row["roads_cleared"] - 0.1*row["energy_used"] - 0.05*row["hospital_overflow_events"]
+    return row, metrics.get("history", [])
+
+def run_job(job):
+    """Run one (map, condition, seed) episode; returns (CSV row, per-tick history). Top-level so workers can pickle it."""
+    return _result(job, run_episode(**_episode_kwargs(job)))
+
+def run_batch(jobs):
+    """Run jobs (same provider) in lockstep with concurrent planner calls; returns [(CSV row, history)] in order."""
+    return [_result(job, m) for job, m in zip(jobs, run_lockstep([_episode_kwargs(job) for job in jobs]))]
+
+def make_batches(jobs, batch_size):
+    """Split jobs into lockstep batches of up to `batch_size`, never mixing providers."""
+    by_provider = {}
+    for job in jobs:
+        by_provider.setdefault(parse_condition(job["cond"])[0], []).append(job)
+    return [group[i:i + batch_size] for group in by_provider.values() for i in range(0, len(group), batch_size)]
+
+def job_key(store, job):
+    provider, strategy = parse_condition(job["cond"])
+    return store.key(job["map"], strategy, provider, job["seed"], job["ticks"])
+
+def build_jobs(maps, conditions, n_seeds, ticks, base_seed=1000):
+    # the episode seed depends only on its seed index, so results do not depend on scheduling
+    return [
+        {"map": mappath, "cond": cond, "seed": base_seed + s, "ticks": ticks}
+        for mappath in maps for cond in conditions for s in range(n_seeds)
+    ]
+
+def iter_results(jobs, workers=1, batch_size=1):
+    """
+    Yield (job, (row, history)) as episodes finish; workers > 1 runs them in a
+    process pool, batch_size > 1 runs each worker's episodes in lockstep batches.
+    """
+    if batch_size > 1:
+        batches = make_batches(jobs, batch_size)
+        if workers <= 1:
+            for batch in batches:
+                yield from zip(batch, run_batch(batch))
+            return
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(run_batch, batch): batch for batch in batches}
+            for fut in as_completed(futures):
+                yield from zip(futures[fut], fut.result())
+        return
+    if workers <= 1:
+        for job in jobs:
+            yield job, run_job(job)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_job, job): job for job in jobs}
+        for fut in as_completed(futures):
+            yield futures[fut], fut.result()
 
 def main():
     ap = argparse.ArgumentParser()
@@ -10,55 +122,61 @@ def main():
     ap.add_argument("--maps", nargs="+", default=["configs/map_small.yaml"])
     ap.add_argument("--conditions", nargs="+", default=["react_reflexion_mock"])
     ap.add_argument("--ticks", type=int, default=200)
+    ap.add_argument("--workers", type=int, default=1, help="episodes run in parallel processes (1 = in-process)")
+    ap.add_argument("--batch_size", type=int, default=1,
+                    help="episodes per worker stepped in lockstep, planner calls of a tick issued concurrently")
+    ap.add_argument("--base_seed", type=int, default=1000)
+    ap.add_argument("--cache_dir", type=str, default="results/raw", help="episode result cache (also read by eval/aggregate.py)")
+    ap.add_argument("--no_cache", action="store_true", help="recompute every episode")
+    ap.add_argument("--db", type=str, default="results/results.sqlite", help="SQLite results store read by eval/plots.py")
     args = ap.parse_args()
 
     os.makedirs("results", exist_ok=True)
     os.makedirs("logs", exist_ok=True)
 
-    fieldnames = ["seed","provider","strategy","map","rescued","deaths","avg_rescue_time","fires_extinguished",
-                  "roads_cleared","energy_used","tool_calls","invalid_json","replans","hospital_overflow_events","crisis_score"]
+    jobs = build_jobs(args.maps, args.conditions, args.n_seeds, args.ticks, base_seed=args.base_seed)
+
+    # episodes already in the cache are reused; only the rest are run
+    store = EpisodeStore(args.cache_dir)
+    db = ResultsDB(args.db)
+    cached, pending = [], []
+    for job in jobs:
+        job["key"] = job_key(store, job)
+        rec = None if args.no_cache else store.get(job["key"])
+        if rec is not None:
+            cached.append({k: rec.get(k, "") for k in FIELDNAMES})
+            db.add_episode(rec, replace=False)  # keeps any per-tick history already stored
+        else:
+            pending.append(job)
+    print(f"{len(cached)} episodes cached, {len(pending)} to run.")
 
+    # one CSV per map, rows appended as episodes finish
+    files, writers = {}, {}
     for mappath in args.maps:
         mapname = Path(mappath).stem
-        out_csv = f"results/{mapname}_results.csv"
-        with open(out_csv, "w", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-
-            for cond in args.conditions:
-                if "gemini" in cond:
-                    provider = "gemini"
-                elif "groq" in cond:
-                    provider = "groq"
-                else:
-                    provider = "mock"
-                if "react_reflexion" in cond:
-                    strategy = "react_reflexion"
-                else:
-                    strategy = "react"
-
-                for s in trange(args.n_seeds, desc=f"{mapname}-{cond}"):
-                    seed = 1000 + s
-                    log_path = f"logs/seed_{seed}_{mapname}_{cond}.txt"
-                    metrics = run_episode(mappath, seed=seed, ticks=args.ticks, provider=provider, strategy=strategy, log_path=log_path, render=False)
-                    row = {
-                        "seed": seed,
-                        "provider": provider,
-                        "strategy": strategy,
-                        "map": mapname,
-                        "rescued": metrics.get("rescued",0),
-                        "deaths": metrics.get("deaths",0),
-                        "avg_rescue_time": metrics.get("avg_rescue_time",0.0),
-                        "fires_extinguished": metrics.get("fires_extinguished",0),
-                        "roads_cleared": metrics.get("roads_cleared",0),
-                        "energy_used": metrics.get("energy_used",0),
-                        "tool_calls": metrics.get("tool_calls",0),
-                        "invalid_json": metrics.get("invalid_json",0),
-                        "replans": metrics.get("replans",0),
-                        "hospital_overflow_events": metrics.get("hospital_overflow_events",0),
-                    }
-                    row["crisis_score"] = 3*row["rescued"] - 2*row["deaths"] + 1*row["fires_extinguished"] + 0.5*row["roads_cleared"] - 0.1*row["energy_used"] - 0.05*row["hospital_overflow_events"]
-                    writer.writerow(row)
+        if mapname in files:
+            continue
+        f = open(f"results/{mapname}_results.csv", "w", newline="")
+        files[mapname] = f
+        writers[mapname] = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writers[mapname].writeheader()
+
+    try:
+        for row in cached:
+            writers[row["map"]].writerow(row)
+        for job, (row, history) in tqdm(iter_results(pending, workers=args.workers, batch_size=args.batch_size), total=len(pending), desc="episodes"):
+            # the store key hashes the map file, ticks and code version, so runs differing in any of them keep separate rows
+            record = dict(row, run_id=f"{row['map']}_{row['provider']}_{row['strategy']}_seed{row['seed']}"
+                                      f"_t{job['ticks']}_{job['key'][:12]}",
+                          ticks=job["ticks"], condition=job["cond"], code_version=code_version())
+            store.put(job["key"], record)
+            db.add_episode(record, history=history)
+            writers[row["map"]].writerow(row)
+            files[row["map"]].flush()
+    finally:
+        for f in files.values():
+            f.close()
+        db.close()
 
     print("Done. CSVs saved in results/.")
 
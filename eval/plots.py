@@ -1,41 +1,84 @@
 \
-import argparse, os, glob, pandas as pd
+import argparse, os, sys, glob
 import matplotlib.pyplot as plt
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--input", type=str, default="results")
-    ap.add_argument("--out", type=str, default="results/plots")
-    args = ap.parse_args()
-    os.makedirs(args.out, exist_ok=True)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from eval.results_db import ResultsDB
 
-    files = glob.glob(os.path.join(args.input, "*.csv"))
-    if not files:
-        print("No CSVs found in", args.input)
-        return
-
-    df = pd.concat([pd.read_csv(f) for f in files], ignore_index=True)
-
-    g = df.groupby(["strategy","provider"])["crisis_score"].agg(["mean","std"]).reset_index()
-    labels = g.apply(lambda r: f"{r['strategy']}\\n{r['provider']}", axis=1)
+def plot_score_bars(g, out):
+    labels = [f"{r['strategy']}\\n{r['provider']}" for r in g]
     plt.figure()
-    plt.bar(labels, g["mean"])
+    plt.bar(labels, [r["mean"] for r in g])
     plt.title("CrisisScore by strategy/provider (mean)")
     plt.ylabel("CrisisScore")
     plt.xticks(rotation=45, ha="right")
     plt.tight_layout()
-    plt.savefig(os.path.join(args.out, "crisis_score_comparison.png"))
+    plt.savefig(os.path.join(out, "crisis_score_comparison.png"))
     plt.close()
 
+def plot_json_box(values, out):
     plt.figure()
-    df.boxplot(column="invalid_json", by="provider")
-    plt.suptitle("")
+    plt.boxplot(list(values.values()))
+    plt.xticks(range(1, len(values) + 1), list(values.keys()))
     plt.title("Invalid JSON counts by provider")
     plt.ylabel("count")
     plt.tight_layout()
-    plt.savefig(os.path.join(args.out, "json_error_boxplot.png"))
+    plt.savefig(os.path.join(out, "json_error_boxplot.png"))
     plt.close()
 
+def plots_from_db(db_path, out, map_name=None):
+    """Group-bys run inside SQLite; only the needed columns are read back."""
+    db = ResultsDB(db_path)
+    filters = {"map": map_name} if map_name else {}
+    try:
+        g = db.group_stats("crisis_score", by=("strategy", "provider"), **filters)
+        if not g:
+            print("No episodes in", db_path)
+            return
+        plot_score_bars(g, out)
+        plot_json_box(db.values_by("invalid_json", by="provider", **filters), out)
+
+        curves = db.tick_curve("rescued", by="strategy", **filters)
+        if curves:
+            plt.figure()
+            for strategy, pts in curves.items():
+                plt.plot([t for t, _ in pts], [v for _, v in pts], label=strategy)
+            plt.title("Rescued over time (mean over episodes)")
+            plt.xlabel("tick")
+            plt.ylabel("rescued")
+            plt.legend()
+            plt.tight_layout()
+            plt.savefig(os.path.join(out, "rescued_over_time.png"))
+            plt.close()
+    finally:
+        db.close()
+
+def plots_from_csv(files, out):
+    import pandas as pd
+    df = pd.concat([pd.read_csv(f) for f in files], ignore_index=True)
+    g = df.groupby(["strategy","provider"])["crisis_score"].agg(["mean","std"]).reset_index()
+    plot_score_bars(g.to_dict("records"), out)
+    plot_json_box({p: grp["invalid_json"].tolist() for p, grp in df.groupby("provider")}, out)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--input", type=str, default="results")
+    ap.add_argument("--out", type=str, default="results/plots")
+    ap.add_argument("--map", type=str, default=None, help="only episodes of this map (SQLite input)")
+    args = ap.parse_args()
+    os.makedirs(args.out, exist_ok=True)
+
+    db_path = os.path.join(args.input, "results.sqlite")
+    if os.path.exists(db_path):
+        plots_from_db(db_path, args.out, map_name=args.map)
+    else:
+        # older sweeps: per-map CSVs only
+        files = glob.glob(os.path.join(args.input, "*.csv"))
+        if not files:
+            print("No results.sqlite or CSVs found in", args.input)
+            return
+        plots_from_csv(files, args.out)
+
     print("Plots saved to", args.out)
 
 if __name__ == "__main__":
@@ -0,0 +1,106 @@
+# eval/results_db.py
+import math, sqlite3
+
+GROUP_COLS = ["map", "strategy", "provider"]
+EPISODE_METRICS = ["rescued","deaths","avg_rescue_time","fires_extinguished","roads_cleared","energy_used",
+                   "tool_calls","invalid_json","replans","hospital_overflow_events","crisis_score",
+                   "path_cache_hits","path_cache_misses"]
+TICK_METRICS = ["rescued","deaths","fires_extinguished","roads_cleared","energy_used",
+                "tool_calls","invalid_json","replans","hospital_overflow_events"]
+
+
+class ResultsDB:
+    """
+    Append-friendly local SQLite store for sweep results:
+      episodes(run_id, map, strategy, provider, seed, ticks, <metrics>) - one row per episode
+                 (run_id must identify the run: the harness includes ticks and
+                 a hash of map file and code version, as re-adding a run_id
+                 replaces its row and tick history)
+      tick_metrics(run_id, tick, <metrics>)                              - per-tick history
+    Both are indexed on map/strategy/provider (or run_id), so plots and
+    aggregation filter and group inside SQLite and only read the columns
+    they need instead of loading every result into memory.
+    """
+    def __init__(self, path="results/results.sqlite"):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        metric_cols = ", ".join(f"{c} REAL" for c in EPISODE_METRICS)
+        tick_cols = ", ".join(f"{c} REAL" for c in TICK_METRICS)
+        self.conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS episodes (
+                run_id TEXT PRIMARY KEY, map TEXT, strategy TEXT, provider TEXT,
+                seed INTEGER, ticks INTEGER, {metric_cols});
+            CREATE INDEX IF NOT EXISTS episodes_group ON episodes (map, strategy, provider);
+            CREATE TABLE IF NOT EXISTS tick_metrics (
+                run_id TEXT, tick INTEGER, {tick_cols}, PRIMARY KEY (run_id, tick)) WITHOUT ROWID;
+        """)
+
+    def close(self):
+        self.conn.close()
+
+    def has_episode(self, run_id):
+        return self.conn.execute("SELECT 1 FROM episodes WHERE run_id = ?", (run_id,)).fetchone() is not None
+
+    def add_episode(self, row, history=None, replace=True):
+        """Insert one episode row (dict) and optionally its per-tick history (list of dicts)."""
+        cols = ["run_id"] + GROUP_COLS + ["seed", "ticks"] + EPISODE_METRICS
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        with self.conn:
+            self.conn.execute(
+                f"{verb} INTO episodes ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+                [row.get(c) for c in cols],
+            )
+            if history:
+                tcols = ["run_id", "tick"] + TICK_METRICS
+                self.conn.execute("DELETE FROM tick_metrics WHERE run_id = ?", (row["run_id"],))
+                self.conn.executemany(
+                    f"INSERT INTO tick_metrics ({', '.join(tcols)}) VALUES ({', '.join('?' * len(tcols))})",
+                    [[row["run_id"], t] + [h.get(c) for c in TICK_METRICS] for t, h in enumerate(history)],
+                )
+
+    @staticmethod
+    def _where(filters, prefix=""):
+        if not filters:
+            return "", []
+        for c in filters:
+            if c not in GROUP_COLS + ["seed", "ticks"]:
+                raise ValueError(f"cannot filter on {c!r}")
+        return " WHERE " + " AND ".join(f"{prefix}{c} = ?" for c in filters), list(filters.values())
+
+    def group_stats(self, metric, by=("strategy", "provider"), **filters):
+        """[{<by...>, "mean", "std", "n"}] for an episode metric, grouped in SQL."""
+        if metric not in EPISODE_METRICS or any(b not in GROUP_COLS for b in by):
+            raise ValueError("unknown metric or group column")
+        where, params = self._where(filters)
+        keys = ", ".join(by)
+        sql = (f"SELECT {keys}, AVG({metric}), AVG({metric} * {metric}), COUNT({metric}) "
+               f"FROM episodes{where} GROUP BY {keys} ORDER BY {keys}")
+        out = []
+        for r in self.conn.execute(sql, params):
+            mean, mean_sq, n = r[-3], r[-2], r[-1]
+            var = max(mean_sq - mean * mean, 0.0) * n / (n - 1) if n and n > 1 else float("nan")
+            out.append(dict(zip(by, r[:-3]), mean=mean, std=math.sqrt(var), n=n))
+        return out
+
+    def values_by(self, metric, by="provider", **filters):
+        """{group: [values]} for one metric column (boxplots), reading only those two columns."""
+        if metric not in EPISODE_METRICS or by not in GROUP_COLS:
+            raise ValueError("unknown metric or group column")
+        where, params = self._where(filters)
+        out = {}
+        for g, v in self.conn.execute(f"SELECT {by}, {metric} FROM episodes{where} ORDER BY {by}", params):
+            out.setdefault(g, []).append(v)
+        return out
+
+    def tick_curve(self, metric, by="strategy", **filters):
+        """{group: [(tick, mean value)]} of a per-tick metric, averaged over episodes in SQL."""
+        if metric not in TICK_METRICS or by not in GROUP_COLS:
+            raise ValueError("unknown metric or group column")
+        where, params = self._where(filters, prefix="e.")
+        sql = (f"SELECT e.{by}, t.tick, AVG(t.{metric}) FROM tick_metrics t "
+               f"JOIN episodes e ON e.run_id = t.run_id{where} GROUP BY e.{by}, t.tick ORDER BY e.{by}, t.tick")
+        out = {}
+        for g, tick, v in self.conn.execute(sql, params):
+            out.setdefault(g, []).append((tick, v))
+        return out
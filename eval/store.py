@@ -0,0 +1,70 @@
+# eval/store.py
+import hashlib, json, os
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+CODE_DIRS = ("env", "tools", "reasoning", "utils")
+
+_code_version = None
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def code_version():
+    """Hash of the simulator/planner sources (main.py + env/tools/reasoning/utils), computed once per process."""
+    global _code_version
+    if _code_version is None:
+        h = hashlib.sha256()
+        files = [ROOT / "main.py"] + sorted(p for d in CODE_DIRS for p in (ROOT / d).rglob("*.py"))
+        for p in files:
+            h.update(str(p.relative_to(ROOT)).encode())
+            h.update(file_hash(p).encode())
+        _code_version = h.hexdigest()[:16]
+    return _code_version
+
+class EpisodeStore:
+    """
+    Content-addressed cache of finished episodes: one JSON file per episode in
+    `root` (results/raw by default, which eval/aggregate.py reads), named by
+    the hash of (map file hash, strategy, provider, seed, ticks, code version).
+    Files are written atomically, so an interrupted sweep resumes from the
+    episodes that completed.
+    """
+    def __init__(self, root="results/raw"):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._map_hashes = {}
+
+    def key(self, map_path, strategy, provider, seed, ticks):
+        if map_path not in self._map_hashes:
+            self._map_hashes[map_path] = file_hash(map_path)
+        ident = {
+            "map": self._map_hashes[map_path],
+            "strategy": strategy,
+            "provider": provider,
+            "seed": int(seed),
+            "ticks": int(ticks),
+            "code": code_version(),
+        }
+        return hashlib.sha256(json.dumps(ident, sort_keys=True).encode()).hexdigest()[:32]
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, record):
+        path = self._path(key)
+        tmp = f"{path}.tmp{os.getpid()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(dict(record, key=key), f)
+        os.replace(tmp, path)
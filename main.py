@@ -1,71 +1,254 @@
 import argparse, os, json, yaml
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
 from env.world import CrisisModel
 from reasoning.planner import make_plan
-from utils.jsonl_logger import write_tick_conversation  # added for per-tick JSONL
+from reasoning.async_client import SharedLLMClient
+from reasoning.context_encoder import summarize_plan
+from utils.jsonl_logger import RunLogger, read_run_log, LOG_PLANS, LOG_STATE, LOG_FULL
+from utils.snapshots import SnapshotEncoder, SnapshotDecoder, state_hash
 
 def load_config(path):
     with open(path, "r") as f:
         return yaml.safe_load(f) or {}
 
-def run_episode(map_path, seed=42, ticks=200, provider="mock", strategy="react_reflexion", log_path=None, render=False):
-    os.environ["LLM_PROVIDER"] = provider
-    cfg = load_config(map_path)
-    W = cfg.get("width", 20)
-    H = cfg.get("height", 20)
+class Episode:
+    """
+    One simulation run driven one tick at a time: context() returns the
+    planner input for the current tick and advance(plan) logs and applies the
+    plan and steps the model. run_episode() drives a single Episode;
+    run_lockstep() advances several together so their planner calls overlap.
+    """
+    def __init__(self, map_path, seed=42, ticks=200, provider="mock", strategy="react_reflexion", log_path=None,
+                 render=False, with_history=False, log_verbosity=LOG_STATE, log_compress=False, keyframe_every=50,
+                 plan_horizon=10):
+        os.environ["LLM_PROVIDER"] = provider
+        cfg = load_config(map_path)
+        W = cfg.get("width", 20)
+        H = cfg.get("height", 20)
 
-    model = CrisisModel(W, H, rng_seed=seed, config=cfg, render=render)
+        self.model = CrisisModel(W, H, rng_seed=seed, config=cfg, render=render)
+        self.strategy = strategy
+        self.provider = provider
+        self.ticks = ticks
+        self.plan_horizon = plan_horizon
+        self.with_history = with_history
+        self.log_verbosity = log_verbosity
+        self.t = 0
 
-    if log_path is None:
-        log_path = f"logs/seed_{seed}_{Path(map_path).stem}_{provider}_{strategy}.txt"
-    os.makedirs(Path(log_path).parent, exist_ok=True)
-    logf = open(log_path, "w", buffering=1, encoding="utf-8")
+        # ---- run_id for JSONL logs (added) ----
+        self.run_id = f"{Path(map_path).stem}_{provider}_{strategy}_seed{seed}"
 
-    transcript = []
+        # One buffered JSONL stream per run, written on a background thread
+        if log_path is None:
+            log_path = f"logs/strategy={strategy}/run={self.run_id}.jsonl"
+        self.runlog = RunLogger(log_path, verbosity=log_verbosity, compress=log_compress)
+        self.runlog.header(map=str(map_path), seed=seed, ticks=ticks, provider=provider, strategy=strategy,
+                           run_id=self.run_id, keyframe_every=keyframe_every)
+        # state records: a full keyframe every `keyframe_every` ticks, deltas in between (utils/snapshots.py)
+        self.snapshots = SnapshotEncoder(keyframe_every)
 
-    # ---- run_id for JSONL logs (added) ----
-    run_id = f"{Path(map_path).stem}_{provider}_{strategy}_seed{seed}"
+        self.transcript = []
+        self.prompt_tokens = 0
+        self.llm_calls = 0
+        self.planner_calls = 0
+        self.planner_memory = {}   # per-episode planner state (hybrid gating)
+        self._context = None
 
-    for t in range(ticks):
-        state = model.summarize_state()
-        plan = make_plan(state, strategy=strategy, scratchpad="\n".join(transcript[-10:]))
-        cmds = plan.get("commands", [])
-        model.set_plan(cmds)
+    @property
+    def done(self):
+        return self.t >= self.ticks
 
-        # ---- Sprint-1 per-tick JSONL logging (added) ----
-        # Build conversation payloads and write logs/strategy=<name>/run=<id>/tickNNN.jsonl
-        try:
-            conv_lines = [
-                {"role": "system", "content": f"strategy={strategy}"},
-                {"role": "user", "content": json.dumps(state, ensure_ascii=False)[:4000]},
-                {"role": "assistant", "content": "FINAL_JSON: " + json.dumps(plan, ensure_ascii=False)},
-            ]
-            write_tick_conversation(
-                base_dir="logs",
-                strategy=strategy,
-                run_id=run_id,
-                tick=t,
-                conversation_lines=conv_lines
-            )
-        except Exception:
-            # non-fatal: keep the sim running even if logging fails
-            pass
+    def context(self):
+        """(state, scratchpad) for the current tick."""
+        if self._context is None:
+            self._context = (self.model.summarize_state(), "\n".join(self.transcript[-10:]))
+        return self._context
 
-        # Track invalid_json count if planner returned empty/malformed commands (added)
-        try:
-            model.invalid_json = getattr(model, "invalid_json", 0) + (0 if (isinstance(plan, dict) and plan.get("commands")) else 1)
-        except Exception:
-            pass
-        # -----------------------------------------------
+    def plan(self):
+        """
+        The planner's output for this tick, or a "cached" no-op plan while the
+        model's multi-tick agent plans are valid and younger than plan_horizon.
+        When only some agents' plans finished or failed, the plan carries their
+        ids ("agents") and is applied to those agents alone.
+        """
+        scope = self.model.agents_to_replan(self.plan_horizon)
+        if scope == []:
+            return {"commands": [], "planner": "cached"}
+        state, scratchpad = self.context()
+        plan = make_plan(state, strategy=self.strategy, scratchpad=scratchpad, memory=self.planner_memory)
+        if scope is not None and isinstance(plan, dict):
+            plan["agents"] = scope
+        return plan
+
+    def advance(self, plan):
+        t = self.t
+        state, scratchpad = self.context()
+        _apply_plan(self.model, plan)
+
+        # the state hash lets --replay verify that it reproduces this run tick by tick
+        self.runlog.log(t, "plan", LOG_PLANS, plan=plan, state_hash=state_hash(state))
+        if self.log_verbosity >= LOG_STATE:
+            self.runlog.log(t, "state", LOG_STATE, **self.snapshots.encode(state))
+        self.runlog.log(t, "conversation", LOG_FULL, lines=[
+            {"role": "system", "content": f"strategy={self.strategy}"},
+            {"role": "assistant", "content": f"Notes:\n{scratchpad}"},
+            {"role": "user", "content": state},
+            {"role": "assistant", "content": "FINAL_JSON: " + json.dumps(plan, ensure_ascii=False)},
+        ])
+
+        cached = isinstance(plan, dict) and plan.get("planner") == "cached"
+        if not cached:
+            self.transcript.append(summarize_plan(t, plan))
+            self.planner_calls += 1
+        self.prompt_tokens += plan.get("prompt_tokens", 0) if isinstance(plan, dict) else 0
+        self.llm_calls += 1 if isinstance(plan, dict) and plan.get("planner") == "llm" else 0
+
+        self.model.step()
+        self.t += 1
+        self._context = None
+        if self.done:
+            self.runlog.log(self.t, "end", LOG_PLANS, state_hash=state_hash(self.model.summarize_state()))
+
+    def close(self):
+        self.runlog.close()
+
+    def metrics(self):
+        metrics = episode_metrics(self.model, self.with_history)
+        metrics["prompt_tokens"] = self.prompt_tokens
+        metrics["llm_calls"] = self.llm_calls
+        metrics["planner_calls"] = self.planner_calls
+        return metrics
 
-        logf.write(f"=== t={t} ===\n")
-        logf.write(json.dumps({"context": state, "plan": plan})[:2000] + "\n")
-        transcript.append(f"t={t}: plan={plan}")
+def run_episode(map_path, seed=42, ticks=200, provider="mock", strategy="react_reflexion", log_path=None, render=False,
+                with_history=False, log_verbosity=LOG_STATE, log_compress=False, keyframe_every=50, plan_horizon=10):
+    ep = Episode(map_path, seed=seed, ticks=ticks, provider=provider, strategy=strategy, log_path=log_path,
+                 render=render, with_history=with_history, log_verbosity=log_verbosity, log_compress=log_compress,
+                 keyframe_every=keyframe_every, plan_horizon=plan_horizon)
+    try:
+        while not ep.done:
+            ep.advance(ep.plan())
+    finally:
+        ep.close()
+    return ep.metrics()
 
+def run_lockstep(specs, workers=None):
+    """
+    Run several episodes in lockstep: at each tick the planner is called for
+    every unfinished episode concurrently (thread pool of `workers`, default
+    one per episode), then all plans are applied and the models stepped.
+    With an LLM planner a batch takes about as long as its slowest episode
+    rather than the sum of them; the requests share one SharedLLMClient, so
+    LLM_CONCURRENCY / LLM_RPS / LLM_TIMEOUT / LLM_MAX_RETRIES bound them
+    however many episodes run. `specs` are run_episode keyword dicts; they
+    must share one provider since LLM_PROVIDER is process-wide. Returns the
+    metrics of each episode, in order.
+    """
+    providers = {spec.get("provider", "mock") for spec in specs}
+    if len(providers) > 1:
+        raise ValueError("episodes run in lockstep must use the same provider")
+    provider = next(iter(providers), "mock")
+    with SharedLLMClient(provider) if provider != "mock" else nullcontext():
+        return _run_lockstep(specs, workers)
+
+def _run_lockstep(specs, workers):
+    episodes = []
+    try:
+        for spec in specs:
+            episodes.append(Episode(**spec))
+        with ThreadPoolExecutor(max_workers=workers or max(1, len(episodes))) as pool:
+            live = [ep for ep in episodes if not ep.done]
+            while live:
+                for ep in live:
+                    ep.context()
+                for ep, plan in zip(live, pool.map(Episode.plan, live)):
+                    ep.advance(plan)
+                live = [ep for ep in live if not ep.done]
+    finally:
+        errors = []
+        for ep in episodes:
+            try:
+                ep.close()
+            except OSError as e:   # close every log before reporting a failed one
+                errors.append(e)
+        if errors:
+            raise errors[0]
+    return [ep.metrics() for ep in episodes]
+
+def _apply_plan(model, plan):
+    if isinstance(plan, dict) and plan.get("planner") == "cached":
+        return  # no planner call this tick: the model keeps executing its cached agent plans
+    model.set_plan(plan.get("commands", []), agents=plan.get("agents"))
+    # Track invalid_json count if planner returned empty/malformed commands (added);
+    # an empty heuristic plan just means every agent is busy or idle
+    try:
+        ok = isinstance(plan, dict) and (plan.get("commands") or plan.get("planner") == "heuristic")
+        model.invalid_json = getattr(model, "invalid_json", 0) + (0 if ok else 1)
+    except Exception:
+        pass
+
+def replay_episode(log_path, verify=True, with_history=False):
+    """
+    Re-run a logged episode from its recorded plans: same map and seed, no
+    make_plan calls. With `verify`, the state hash of every tick is checked
+    against the one recorded in the log and the first mismatch raises
+    ValueError; otherwise the first diverging tick is reported in the metrics.
+    State snapshots in the log (log_verbosity >= LOG_STATE) are decoded and
+    checked against the same hashes, so a lossy snapshot encoding is caught
+    too (raised, or reported as `snapshot_mismatch_at`).
+    """
+    header, plans, hashes, decoded = None, {}, {}, {}
+    decoder = SnapshotDecoder()
+    for rec in read_run_log(log_path):
+        if rec["type"] == "run":
+            header = rec
+        elif rec["type"] == "plan":
+            plans[rec["tick"]] = rec["plan"]
+            hashes[rec["tick"]] = rec.get("state_hash")
+        elif rec["type"] == "end":
+            hashes[rec["tick"]] = rec.get("state_hash")
+        elif rec["type"] == "state":
+            decoded[rec["tick"]] = state_hash(decoder.apply(rec))
+    if header is None or not plans:
+        raise ValueError(f"{log_path}: no run header or recorded plans (log_verbosity must be >= {LOG_PLANS})")
+    snapshot_mismatch_at = next((t for t in sorted(decoded) if hashes.get(t) not in (None, decoded[t])), None)
+    if verify and snapshot_mismatch_at is not None:
+        raise ValueError(f"{log_path}: decoded state snapshot of tick {snapshot_mismatch_at} does not match its hash")
+
+    cfg = load_config(header["map"])
+    model = CrisisModel(cfg.get("width", 20), cfg.get("height", 20), rng_seed=header["seed"], config=cfg)
+    ticks = header["ticks"]
+    diverged_at = None
+
+    def check(t):
+        nonlocal diverged_at
+        expected = hashes.get(t)
+        if expected is None or diverged_at is not None:
+            return
+        if state_hash(model.summarize_state()) != expected:
+            if verify:
+                raise ValueError(f"{log_path}: replay diverged at tick {t}")
+            diverged_at = t
+
+    for t in range(ticks):
+        if t not in plans:
+            raise ValueError(f"{log_path}: no plan recorded for tick {t}")
+        check(t)
+        _apply_plan(model, plans[t])
         model.step()
+    check(ticks)
 
-    logf.close()
+    metrics = episode_metrics(model, with_history)
+    metrics["prompt_tokens"] = sum(p.get("prompt_tokens", 0) for p in plans.values() if isinstance(p, dict))
+    metrics["llm_calls"] = sum(1 for p in plans.values() if isinstance(p, dict) and p.get("planner") == "llm")
+    metrics["planner_calls"] = sum(1 for p in plans.values() if not (isinstance(p, dict) and p.get("planner") == "cached"))
+    metrics["replayed_from"] = str(log_path)
+    metrics["replay_diverged_at"] = diverged_at
+    metrics["snapshot_mismatch_at"] = snapshot_mismatch_at
+    return metrics
 
+def episode_metrics(model, with_history=False):
     hist = model.datacollector.get_model_vars_dataframe()
     rescued = int(hist["rescued"].max() if len(hist) else 0)
     deaths = int(hist["deaths"].max() if len(hist) else 0)
@@ -84,6 +267,15 @@ def run_episode(map_path, seed=42, ticks=200, provider="mock", strategy="react_r
         "replans": model.replans,
         "hospital_overflow_events": model.hospital_overflow_events,
     }
+    routing = model.routing_stats()
+    metrics["path_cache_hits"] = routing["hits"]
+    metrics["path_cache_misses"] = routing["misses"]
+    rescue = model.hospital_stats()["rescue_time"]
+    metrics["rescue_time_p50"] = rescue["p50"]
+    metrics["rescue_time_p95"] = rescue["p95"]
+    if with_history:
+        # per-tick DataCollector rows, e.g. for eval/results_db.py tick_metrics
+        metrics["history"] = hist.to_dict("records")
     return metrics
 # --- context discovery helper -----------------------------------------------
 def build_state(model):
@@ -157,8 +349,21 @@ def main():
     ap.add_argument("--seed", type=int, default=42)
     ap.add_argument("--ticks", type=int, default=200)
     ap.add_argument("--render", action="store_true")
+    ap.add_argument("--log_verbosity", type=int, default=LOG_STATE, help="0=off 1=plans 2=+state 3=+conversation")
+    ap.add_argument("--log_compress", action="store_true", help="gzip the run log")
+    ap.add_argument("--keyframe_every", type=int, default=50, help="full state snapshot every N ticks, deltas in between")
+    ap.add_argument("--plan_horizon", type=int, default=10,
+                    help="max ticks agents follow cached multi-tick plans before the planner runs again")
+    ap.add_argument("--replay", type=str, default=None, help="re-run a run log's recorded plans instead of planning")
+    ap.add_argument("--no_verify", action="store_true", help="with --replay, report divergence instead of failing")
     args = ap.parse_args()
-    m = run_episode(args.map, seed=args.seed, ticks=args.ticks, provider=args.provider, strategy=args.strategy, render=args.render)
+    if args.replay:
+        m = replay_episode(args.replay, verify=not args.no_verify)
+        print(json.dumps(m, indent=2))
+        return
+    m = run_episode(args.map, seed=args.seed, ticks=args.ticks, provider=args.provider, strategy=args.strategy, render=args.render,
+                    log_verbosity=args.log_verbosity, log_compress=args.log_compress,
+                    keyframe_every=args.keyframe_every, plan_horizon=args.plan_horizon)
     print(json.dumps(m, indent=2))
 
 if __name__ == "__main__":
@@ -0,0 +1,227 @@
+# reasoning/async_client.py
+import asyncio, os, random, threading, time
+from . import llm_client
+from .llm_cache import cache_key
+from .llm_client import DEFAULT_MODELS, MOCK_RESPONSE, get_cache
+
+
+class TokenBucket:
+    """Async rate limiter: `rate` requests per second on average, bursts up to `capacity`."""
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class MockLLMServer:
+    """
+    In-process stand-in for a provider endpoint, for tests and dry runs:
+    answers after `latency` seconds, fails every `fail_every`-th request
+    (0 = never) and records call count and peak concurrency.
+    """
+    def __init__(self, response=MOCK_RESPONSE, latency: float = 0.0, fail_every: int = 0):
+        self.response = response
+        self.latency = latency
+        self.fail_every = fail_every
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, messages, model, temperature, max_tokens):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if self.fail_every and self.calls % self.fail_every == 0:
+                raise ConnectionError("mock server: injected failure")
+            return self.response(messages) if callable(self.response) else self.response
+        finally:
+            self.in_flight -= 1
+
+
+def _groq_backend():
+    from groq import AsyncGroq
+    client = AsyncGroq(api_key=os.getenv("GROQ_API_KEY"), max_retries=0)
+
+    async def complete(messages, model, temperature, max_tokens):
+        resp = await client.chat.completions.create(
+            model=model, messages=messages, temperature=temperature, max_tokens=max_tokens,
+        )
+        return resp.choices[0].message.content
+    complete.aclose = client.close
+    return complete
+
+
+def _gemini_backend():
+    import google.generativeai as genai
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    models = {}
+
+    async def complete(messages, model, temperature, max_tokens):
+        system = "\n\n".join(m["content"] for m in messages if m["role"] == "system") or None
+        if (model, system) not in models:
+            models[(model, system)] = genai.GenerativeModel(model, system_instruction=system)
+        contents = [{"role": "model" if m["role"] == "assistant" else "user", "parts": [m["content"]]}
+                    for m in messages if m["role"] != "system"]
+        config = {"temperature": temperature}
+        if max_tokens is not None:
+            config["max_output_tokens"] = max_tokens
+        resp = await models[(model, system)].generate_content_async(contents, generation_config=config)
+        return resp.text
+    return complete
+
+
+_BACKENDS = {"groq": _groq_backend, "gemini": _gemini_backend}
+
+
+class AsyncLLMClient:
+    """
+    asyncio chat-completion client for one provider. The provider SDK client
+    is created once and reused for every request; at most `concurrency`
+    requests are in flight, `rate` (requests/s, optional) is enforced with a
+    token bucket, and each attempt is bounded by `timeout` seconds. Failed
+    attempts are retried up to `max_retries` times with exponential backoff
+    and jitter; cancellation propagates to the caller. Responses go through
+    the same disk cache as llm_client.call_llm. Pass `backend` (an async
+    callable, e.g. MockLLMServer) to replace the provider SDK.
+    """
+    def __init__(self, provider: str = None, model: str = None, concurrency: int = None, rate: float = None,
+                 timeout: float = None, max_retries: int = None, backoff: float = 0.5, backend=None,
+                 use_cache: bool = True):
+        self.provider = (provider or os.getenv("LLM_PROVIDER", "mock")).lower()
+        self.model = model or DEFAULT_MODELS.get(self.provider, self.provider)
+        concurrency = concurrency or int(os.getenv("LLM_CONCURRENCY", "8"))
+        rate = rate if rate is not None else float(os.getenv("LLM_RPS", "0")) or None
+        self.timeout = timeout if timeout is not None else float(os.getenv("LLM_TIMEOUT", "60"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("LLM_MAX_RETRIES", "3"))
+        self.backoff = backoff
+        self._backend = backend
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._bucket = TokenBucket(rate) if rate else None
+        self.use_cache = use_cache and backend is None and self.provider in _BACKENDS
+        self.requests = self.retries = self.failures = 0
+
+    def _get_backend(self):
+        if self._backend is None:
+            factory = _BACKENDS.get(self.provider)
+            self._backend = factory() if factory else MockLLMServer()
+        return self._backend
+
+    async def complete(self, messages, temperature: float = 0.2, max_tokens: int = None) -> str:
+        """One chat completion; errors come back as "FinalAnswer: ERROR ..." text, like call_llm."""
+        messages = [{"role": m.get("role", "user"), "content": m.get("content", "")} for m in messages]
+        cache = get_cache() if self.use_cache else None
+        key = None
+        if cache is not None:
+            key = cache_key(self.provider, self.model, messages, temperature=temperature, max_tokens=max_tokens)
+            hit = cache.get(key)
+            if hit is not None:
+                return hit
+
+        backend = self._get_backend()
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.retries += 1
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1) * (0.5 + random.random()))
+            try:
+                async with self._semaphore:
+                    if self._bucket is not None:
+                        await self._bucket.acquire()
+                    self.requests += 1
+                    text = await asyncio.wait_for(
+                        backend(messages, self.model, temperature, max_tokens), self.timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # includes asyncio.TimeoutError
+                error = e
+                continue
+            if cache is not None and text is not None:
+                cache.put(key, text, provider=self.provider, model=self.model)
+            return text
+        self.failures += 1
+        return f"FinalAnswer: ERROR calling {self.provider.capitalize()}: {error!r}"
+
+    async def complete_many(self, batch, temperature: float = 0.2, max_tokens: int = None):
+        """Complete a list of message lists concurrently (within the limits); results keep input order."""
+        return await asyncio.gather(*(self.complete(m, temperature, max_tokens) for m in batch))
+
+    def stats(self):
+        return {"requests": self.requests, "retries": self.retries, "failures": self.failures}
+
+    async def aclose(self):
+        close = getattr(self._backend, "aclose", None)
+        if close is not None:
+            await close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+
+class SharedLLMClient:
+    """
+    Blocking front end for one AsyncLLMClient shared by many threads (e.g.
+    main.run_lockstep's planner pool). The client runs on its own event-loop
+    thread, so every caller shares its pooled provider connection and its
+    concurrency, rate, timeout and retry limits (LLM_CONCURRENCY, LLM_RPS,
+    LLM_TIMEOUT, LLM_MAX_RETRIES). Used as a context manager it also routes
+    llm_client.call_llm through itself until it is closed.
+    """
+    def __init__(self, provider: str = None, **kwargs):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-client", daemon=True)
+        self._thread.start()
+        self.client = self._run(self._create(provider, kwargs))
+        self._previous = None
+
+    @staticmethod
+    async def _create(provider, kwargs):
+        return AsyncLLMClient(provider, **kwargs)   # built on the loop that will run it
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def accepts(self, provider, model):
+        return provider == self.client.provider and model == self.client.model
+
+    def complete(self, messages, temperature: float = 0.2, max_tokens: int = None) -> str:
+        return self._run(self.client.complete(messages, temperature, max_tokens))
+
+    def stats(self):
+        return self.client.stats()
+
+    def close(self):
+        if self._loop.is_closed():
+            return
+        try:
+            self._run(self.client.aclose())
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+
+    def __enter__(self):
+        self._previous = llm_client.set_shared_client(self)
+        return self
+
+    def __exit__(self, *exc):
+        llm_client.set_shared_client(self._previous)
+        self.close()
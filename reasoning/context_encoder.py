@@ -0,0 +1,158 @@
+# reasoning/context_encoder.py
+import json, re
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Prompt token count: tiktoken's cl100k_base if installed, else a word/punctuation estimate."""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return len(_TOKEN_RE.findall(text))
+
+
+def count_message_tokens(messages) -> int:
+    return sum(count_tokens(m.get("content", "")) + 4 for m in messages)  # + role/separator overhead
+
+
+def run_lengths(cells):
+    """[[x, y], ...] -> horizontal runs [[y, x0, x1], ...] (inclusive), in row-major order."""
+    runs = []
+    for x, y in sorted(((int(c[0]), int(c[1])) for c in cells), key=lambda c: (c[1], c[0])):
+        if runs and runs[-1][0] == y and runs[-1][2] == x - 1:
+            runs[-1][2] = x
+        else:
+            runs.append([y, x, x])
+    return runs
+
+
+def _near(origin, cells, k):
+    ox, oy = origin
+    return sorted(cells, key=lambda c: abs(c[0] - ox) + abs(c[1] - oy))[:k]
+
+
+def _run_distance(run, agents):
+    y, x0, x1 = run
+    return min((abs(y - a[1]) + max(x0 - a[0], 0, a[0] - x1) for a in agents), default=0)
+
+
+def encode_state(state, k: int = 3, max_runs: int = None):
+    """
+    Compact planner view of a summarize_state() dict:
+      agents:    id, kind, absolute pos, non-empty resources, the multi-tick
+                 plan it is executing (if any), and `near`: the k
+                 most relevant targets as [dx, dy(, deadline, id)] offsets from
+                 the agent (survivors for medics/drones, fires and rubble for trucks)
+      fires/rubble: horizontal runs [y, x0, x1], nearest to any agent first when
+                 limited to `max_runs`
+      hospitals: [x, y, queue_len]
+    """
+    agents_pos = [tuple(a["pos"]) for a in state.get("agents", []) if a.get("pos")]
+    survivors = state.get("survivors", [])
+    fires = state.get("fires", [])
+    rubble = state.get("rubble", [])
+
+    agents = []
+    for a in state.get("agents", []):
+        out = {"id": a["id"], "kind": a.get("kind"), "pos": a.get("pos")}
+        for key in ("battery", "water", "tools"):
+            if a.get(key) is not None:
+                out[key] = a[key]
+        if a.get("carrying"):
+            out["carrying"] = a["carrying"]
+        if a.get("plan"):
+            out["plan"] = {key: v for key, v in a["plan"].items() if key != "agent_id"}
+        if a.get("pos") and k > 0:
+            ax, ay = a["pos"]
+            near = {}
+            if a.get("kind") in ("medic", "drone"):
+                by_rank = sorted(survivors, key=lambda s: (abs(s["pos"][0] - ax) + abs(s["pos"][1] - ay),
+                                                           s.get("deadline") or 0))
+                near["survivors"] = [[s["pos"][0] - ax, s["pos"][1] - ay, s.get("deadline"), s["id"]]
+                                     for s in by_rank[:k]]
+            if a.get("kind") == "truck":
+                near["fires"] = [[x - ax, y - ay] for x, y in _near((ax, ay), fires, k)]
+                near["rubble"] = [[x - ax, y - ay] for x, y in _near((ax, ay), rubble, k)]
+            near = {key: v for key, v in near.items() if v}
+            if near:
+                out["near"] = near
+        agents.append(out)
+
+    ctx = {
+        "grid": [state["grid"]["w"], state["grid"]["h"]] if "grid" in state else None,
+        "depot": state.get("depot"),
+        "hospitals": [h["pos"] + [h.get("queue_len", 0)] for h in state.get("hospitals", [])],
+        "agents": agents,
+        "survivors_total": len(survivors),
+    }
+    for key, cells in (("fires", fires), ("rubble", rubble)):
+        runs = run_lengths(cells)
+        if max_runs is not None and len(runs) > max_runs:
+            runs = sorted(runs, key=lambda r: _run_distance(r, agents_pos))[:max_runs]
+            ctx[f"{key}_omitted"] = len(run_lengths(cells)) - max_runs
+        ctx[key] = runs
+    return ctx
+
+
+CONTEXT_LEGEND = ("agents[].near: nearest targets as [dx,dy] offsets from the agent's pos "
+                  "(survivors: [dx,dy,deadline,id]); fires/rubble: row runs [y,x0,x1]; hospitals: [x,y,queue_len]")
+
+
+def dumps(obj) -> str:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+def encode_context(state, token_budget: int = None, k: int = 3):
+    """
+    encode_state() serialized as compact JSON, shrunk until it fits
+    `token_budget`: fewer fire/rubble runs (nearest to agents kept), then
+    fewer targets per agent. Returns (json_text, token_count).
+    """
+    text = dumps(encode_state(state, k=k))
+    tokens = count_tokens(text)
+    if token_budget is None or tokens <= token_budget:
+        return text, tokens
+    n_runs = max(len(run_lengths(state.get("fires", []))), len(run_lengths(state.get("rubble", []))))
+    for kk in range(k, 0, -1):
+        max_runs = n_runs
+        while True:
+            max_runs //= 2
+            text = dumps(encode_state(state, k=kk, max_runs=max_runs))
+            tokens = count_tokens(text)
+            if tokens <= token_budget:
+                return text, tokens
+            if max_runs == 0:
+                break
+    return text, tokens
+
+
+def summarize_plan(t, plan):
+    """One compact scratchpad line per planned tick, e.g. "t=3: 1>4,5 2:pickup_survivor 3:rescue(s2)"."""
+    commands = plan.get("commands") if isinstance(plan, dict) else None
+    parts = []
+    for c in commands if isinstance(commands, list) else []:
+        if not isinstance(c, dict):
+            continue
+        if c.get("type") == "move" and c.get("to"):
+            parts.append(f"{c.get('agent_id')}>{c['to'][0]},{c['to'][1]}")
+        elif c.get("type") == "act":
+            parts.append(f"{c.get('agent_id')}:{c.get('action_name')}")
+        elif c.get("type") == "route" and c.get("waypoints"):
+            route = ";".join(f"{w[0]},{w[1]}" for w in c["waypoints"])
+            parts.append(f"{c.get('agent_id')}>>{route}" + (f":{c['then']}" if c.get("then") else ""))
+        elif c.get("type") == "rescue":
+            parts.append(f"{c.get('agent_id')}:rescue({c.get('survivor_id') or '*'}{'+' if c.get('repeat') else ''})")
+        elif c.get("type") == "clear":
+            target = c.get("target")
+            parts.append(f"{c.get('agent_id')}:clear({c.get('hazard', 'any')}" + (f"@{target[0]},{target[1]})" if target else ")"))
+        else:
+            parts.append(dumps(c))
+    return f"t={t}: " + (" ".join(parts) if parts else "-")
@@ -0,0 +1,311 @@
+# reasoning/heuristic.py
+from typing import Dict, Any, List
+from env.grid import CELL_FIRE, CELL_ROAD, CELL_RUBBLE, CompactGrid
+from tools.routing import route_matrix
+
+DIRS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+
+
+class StateMap:
+    """model_like view of a summarize_state() dict for tools.routing: fires and rubble are the only known obstacles."""
+    def __init__(self, state):
+        self.width = state["grid"]["w"]
+        self.height = state["grid"]["h"]
+        self.cell_types = CompactGrid(self.width, self.height, fill=CELL_ROAD)
+        for x, y in state.get("fires", []):
+            self.cell_types[y][x] = CELL_FIRE
+        for x, y in state.get("rubble", []):
+            self.cell_types[y][x] = CELL_RUBBLE
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def passable(self, x, y):
+        return self.in_bounds(x, y) and self.cell_types[y][x] not in (CELL_FIRE, CELL_RUBBLE)
+
+
+def _nearest(pos, cells):
+    return min(cells, key=lambda c: (abs(c[0] - pos[0]) + abs(c[1] - pos[1]), c[1], c[0]))
+
+
+def _rescue(agent_id, survivor_id=None, direct=False):
+    """Standing rescue order (env/plans.py): `survivor_id` first, then the nearest survivors."""
+    cmd = {"agent_id": agent_id, "type": "rescue", "repeat": True}
+    if survivor_id is not None:
+        cmd["survivor_id"] = survivor_id
+    if direct:
+        cmd["direct"] = True
+    return cmd
+
+
+def _clear(agent_id, target, direct=False):
+    """Standing clear order for a truck: `target` first, then the nearest hazards it can handle."""
+    cmd = {"agent_id": agent_id, "type": "clear", "hazard": "any", "target": list(target)}
+    if direct:
+        cmd["direct"] = True
+    return cmd
+
+
+def _route(agent_id, waypoints, then=None):
+    """Multi-tick command: walk through `waypoints`, optionally act at the last one (env/plans.py)."""
+    cmd = {"agent_id": agent_id, "type": "route", "waypoints": [list(w) for w in waypoints]}
+    if then:
+        cmd["then"] = then
+    return cmd
+
+
+def _greedy_assign(agents, targets, costs, feasible=lambda i, j, c: True):
+    """
+    Cheapest-first one-to-one assignment from a cost matrix; returns
+    {agent index: target index}. Ties break by agent then target order.
+    """
+    pairs = sorted(
+        (c, i, j) for i, row in enumerate(costs) for j, c in enumerate(row)
+        if c is not None and feasible(i, j, c)
+    )
+    out, used = {}, set()
+    for c, i, j in pairs:
+        if i in out or j in used:
+            continue
+        out[i] = j
+        used.add(j)
+    return out
+
+
+def plan_medics(state, smap, medics, blocked):
+    cmds = []
+    hospitals = [tuple(h["pos"]) for h in state.get("hospitals", [])]
+    survivors = state.get("survivors", [])
+    survivor_cells = {tuple(s["pos"]) for s in survivors}
+
+    # carrying: drop at the current hospital or head for the nearest reachable one
+    free = []
+    for a in medics:
+        pos = tuple(a["pos"])
+        if not a.get("carrying"):
+            free.append(a)
+        elif pos in hospitals:
+            cmds.append(_rescue(a["id"]))
+        elif hospitals:
+            res = route_matrix(smap, [pos], hospitals)
+            if any(c is not None for c in res["costs"][0]):
+                cmds.append(_rescue(a["id"]))   # deliver to the nearest reachable hospital, then keep rescuing
+            else:
+                blocked.append(a["id"])
+                cmds.append(_rescue(a["id"], direct=True))
+
+    # free medics: pick up here, else greedy assignment to survivors they can reach before the deadline
+    go = []
+    survivor_at = {}
+    for s in survivors:
+        survivor_at.setdefault(tuple(s["pos"]), s["id"])
+    for a in free:
+        if tuple(a["pos"]) in survivor_cells:
+            cmds.append(_rescue(a["id"], survivor_at[tuple(a["pos"])]))
+            survivor_cells.discard(tuple(a["pos"]))
+        else:
+            go.append(a)
+    targets = [s for s in survivors if tuple(s["pos"]) in survivor_cells]
+    if go and targets:
+        res = route_matrix(smap, [tuple(a["pos"]) for a in go], [tuple(s["pos"]) for s in targets])
+        deadline_ok = lambda i, j, c: targets[j].get("deadline") is None or c - 1 <= targets[j]["deadline"]
+        assigned = _greedy_assign(go, targets, res["costs"], feasible=deadline_ok)
+        left = [tuple(s["pos"]) for j, s in enumerate(targets) if j not in assigned.values()]
+        for i, a in enumerate(go):
+            if i in assigned:
+                cmds.append(_rescue(a["id"], targets[assigned[i]]["id"]))
+            elif all(c is None for c in res["costs"][i]):
+                blocked.append(a["id"])
+                pos = tuple(a["pos"])
+                cell = _nearest(pos, left or [tuple(s["pos"]) for s in targets])
+                cmds.append(_rescue(a["id"], next(s["id"] for s in targets if tuple(s["pos"]) == cell), direct=True))
+    return cmds
+
+
+def plan_trucks(state, smap, trucks, blocked):
+    """Trucks go for the nearest fire (if they have water) or rubble (if they have tools) they can approach."""
+    cmds = []
+    hazards = [(tuple(c), "fire") for c in state.get("fires", [])] + [(tuple(c), "rubble") for c in state.get("rubble", [])]
+    go = []
+    for a in trucks:
+        pos = tuple(a["pos"])
+        here = smap.cell_types[pos[1]][pos[0]]
+        if (here == CELL_FIRE and (a.get("water") or 0) > 0) or (here == CELL_RUBBLE and (a.get("tools") or 0) > 0):
+            cmds.append(_clear(a["id"], pos))
+        else:
+            go.append(a)
+    if not go or not hazards:
+        return cmds
+
+    # hazards are blocked cells, so route to a free neighbour and step in from there
+    approach = sorted({(hx + dx, hy + dy) for (hx, hy), _k in hazards for dx, dy in DIRS
+                       if smap.passable(hx + dx, hy + dy)})
+    col = {cell: k for k, cell in enumerate(approach)}
+    res = route_matrix(smap, [tuple(a["pos"]) for a in go], approach) if approach else None
+
+    def usable(a, kind):
+        return (a.get("water") or 0) > 0 if kind == "fire" else (a.get("tools") or 0) > 0
+
+    def best_approach(i, hazard):
+        """(cost, approach column) of truck i's cheapest neighbour of `hazard`, or None."""
+        hx, hy = hazard
+        options = [(res["costs"][i][col[c]], col[c]) for c in ((hx + dx, hy + dy) for dx, dy in DIRS)
+                   if c in col and res["costs"][i][col[c]] is not None]
+        return min(options) if options else None
+
+    costs = []
+    for i, a in enumerate(go):
+        row = []
+        for cell, kind in hazards:
+            best = best_approach(i, cell) if usable(a, kind) and res is not None else None
+            row.append(best[0] if best else None)
+        costs.append(row)
+    assigned = _greedy_assign(go, hazards, costs)
+    for i, a in enumerate(go):
+        if i not in assigned:
+            mine = {cell: kind for cell, kind in hazards if usable(a, kind)}
+            if mine and all(c is None for c in costs[i]):
+                blocked.append(a["id"])
+                cell = _nearest(tuple(a["pos"]), list(mine))
+                cmds.append(_clear(a["id"], cell, direct=True))
+            continue
+        cmds.append(_clear(a["id"], hazards[assigned[i]][0]))
+    return cmds
+
+
+def patrol_ring(smap, index, radius=1):
+    """Clockwise ring of cells inset `radius + index * (2 * radius + 1)` from the map edge (drone patrol loop)."""
+    inset = radius + index * (2 * radius + 1)
+    x0, y0 = min(inset, (smap.width - 1) // 2), min(inset, (smap.height - 1) // 2)
+    x1, y1 = smap.width - 1 - x0, smap.height - 1 - y0
+    ring = [(x, y0) for x in range(x0, x1 + 1)] + [(x1, y) for y in range(y0 + 1, y1 + 1)]
+    if y1 > y0:
+        ring += [(x, y1) for x in range(x1 - 1, x0 - 1, -1)]
+    if x1 > x0:
+        ring += [(x0, y) for y in range(y1 - 1, y0, -1)]
+    return ring
+
+
+def _ring_corners(ring):
+    """Cells of a patrol ring where its direction turns, in ring order."""
+    n = len(ring)
+    if n < 3:
+        return list(ring)
+    out = []
+    for k, (x, y) in enumerate(ring):
+        px, py = ring[k - 1]
+        nx, ny = ring[(k + 1) % n]
+        if (x - px, y - py) != (nx - x, ny - y):
+            out.append((x, y))
+    return out
+
+
+def plan_drones(state, smap, drones, radius=1):
+    """
+    Each drone patrols its own ring (drones ordered by id, rings moving
+    inwards): a route over the ring's corners once round, clockwise from the
+    drone's position or from the nearest ring cell. Stateless, so the plan
+    depends only on the state.
+    """
+    cmds = []
+    for idx, a in enumerate(sorted(drones, key=lambda d: str(d["id"]))):
+        ring = patrol_ring(smap, idx, radius)
+        pos = tuple(a["pos"])
+        start = pos if pos in ring else min(ring, key=lambda c: (abs(c[0] - pos[0]) + abs(c[1] - pos[1]), c[1], c[0]))
+        i = ring.index(start)
+        corners = set(_ring_corners(ring))
+        waypoints = [c for c in ring[i + 1:] + ring[:i + 1] if c in corners] or [ring[(i + 1) % len(ring)]]
+        if start != pos:
+            waypoints.insert(0, start)
+        if waypoints != [pos]:
+            cmds.append(_route(a["id"], waypoints))
+    return cmds
+
+
+def _unclaimed(context, agents):
+    """Survivors, fires and rubble not already targeted by an agent's multi-tick plan."""
+    claimed_ids, claimed_cells = set(), set()
+    for a in agents:
+        plan = a.get("plan") or {}
+        if plan.get("type") == "rescue" and plan.get("survivor_id"):
+            claimed_ids.add(str(plan["survivor_id"]))
+        elif plan.get("type") == "clear" and plan.get("target"):
+            claimed_cells.add(tuple(plan["target"]))
+        elif plan.get("type") == "route" and plan.get("then") and plan.get("waypoints"):
+            claimed_cells.add(tuple(plan["waypoints"][-1]))
+    return {
+        "survivors": [s for s in context.get("survivors", [])
+                      if str(s["id"]) not in claimed_ids and tuple(s["pos"]) not in claimed_cells],
+        "fires": [c for c in context.get("fires", []) if tuple(c) not in claimed_cells],
+        "rubble": [c for c in context.get("rubble", []) if tuple(c) not in claimed_cells],
+    }
+
+
+def heuristic_plan(context: Dict[str, Any], blocked: List[str] = None) -> Dict[str, Any]:
+    """
+    Deterministic plan from a summarize_state() dict, one command per agent
+    that is not busy with a multi-tick plan (agents[].plan):
+      - medics: a standing rescue order, starting with the survivor they stand
+        on or the one from a greedy cheapest-first assignment to survivors
+        reachable before their deadline (route_matrix costs avoiding fire and
+        rubble); carriers first deliver to the nearest reachable hospital;
+      - trucks: a standing clear order, starting where they stand or with the
+        nearest fire (with water) or rubble (with tools), one truck per hazard;
+      - drones: patrol rings (plan_drones).
+    rescue/clear/route are multi-tick commands the model keeps executing until
+    they finish or fail (env/plans.py); survivors and hazards targeted by a busy
+    agent's plan are left to it. Agents that have work but no reachable
+    target are appended to `blocked` and get a direct route through hazards.
+    """
+    blocked = [] if blocked is None else blocked
+    if not context.get("grid"):
+        return {"commands": []}
+    smap = StateMap(context)
+    agents = [a for a in context.get("agents", []) if a.get("pos")]
+    busy = {str(a["id"]) for a in agents if a.get("plan")}
+    by_kind = {}
+    for a in agents:
+        if str(a["id"]) not in busy or a.get("kind") == "drone":  # drone rings are numbered over the whole fleet
+            by_kind.setdefault(a.get("kind"), []).append(a)
+    open_work = dict(context, **_unclaimed(context, agents))
+    cmds = []
+    cmds += plan_medics(open_work, smap, by_kind.get("medic", []), blocked)
+    cmds += plan_trucks(open_work, smap, by_kind.get("truck", []), blocked)
+    cmds += plan_drones(context, smap, by_kind.get("drone", []))
+    cmds = [c for c in cmds if c and str(c["agent_id"]) not in busy]
+    order = {str(a["id"]): i for i, a in enumerate(agents)}
+    cmds.sort(key=lambda c: order.get(str(c["agent_id"]), len(order)))
+    return {"commands": cmds}
+
+
+# ---------------- Gating policy for hybrid strategies ----------------
+URGENT_DEADLINE = 15   # ticks left at which a survivor counts as urgent
+
+def gate_reasons(context: Dict[str, Any], memory: Dict[str, Any], blocked: List[str]) -> List[str]:
+    """
+    Why this tick needs the LLM rather than the heuristic plan (empty list =
+    routine tick). `memory` carries what was seen at the previous tick:
+      - new_fire:  a new outbreak (a burning cell with no burning neighbour
+                   last tick; ordinary spread is routine);
+      - urgent:    a survivor crossed URGENT_DEADLINE since the last tick;
+      - blocked:   an agent with work has no reachable target;
+      - first:     the first tick of the episode.
+    """
+    reasons = []
+    fires = {tuple(c) for c in context.get("fires", [])}
+    urgent = {str(s["id"]) for s in context.get("survivors", [])
+              if s.get("deadline") is not None and s["deadline"] <= URGENT_DEADLINE}
+    if "fires" not in memory:
+        reasons.append("first")
+    else:
+        prev = memory["fires"]
+        if any(not any((x + dx, y + dy) in prev for dx, dy in DIRS) for x, y in fires - prev):
+            reasons.append("new_fire")
+        if urgent - memory["urgent"]:
+            reasons.append("urgent")
+    if blocked and set(blocked) != memory.get("blocked", set()):
+        reasons.append("blocked")
+    memory["fires"] = fires
+    memory["urgent"] = urgent
+    memory["blocked"] = set(blocked)
+    return reasons
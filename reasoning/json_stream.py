@@ -0,0 +1,89 @@
+# reasoning/json_stream.py
+import json
+
+FINAL_MARKER = "FINAL_JSON"
+
+
+class CommandExtractor:
+    """
+    Incremental scanner for the planner's {"commands": [...]} object in a
+    streamed completion. feed() takes text chunks as they arrive and returns
+    True once a complete top-level JSON object with a "commands" key has been
+    seen; `result` then holds the parsed object and the rest of the stream can
+    be dropped. Braces inside JSON strings are skipped; balanced {...} blocks
+    that are not valid JSON, or have no "commands", are ignored. A FINAL_JSON
+    marker outside JSON strings restarts the scan after it, so an unbalanced
+    "{" in the prose before it cannot swallow the answer (inside an object it
+    can only be prose, since it is not valid JSON there; inside a string it is
+    just text). Each character is scanned once.
+    """
+    def __init__(self):
+        self.text = ""
+        self.result = None
+        self._pos = 0          # next character of `text` to scan
+        self._reset()
+
+    def _reset(self):
+        self._start = None     # index of the current top-level "{"
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def done(self):
+        return self.result is not None
+
+    def feed(self, chunk: str) -> bool:
+        if self.done or not chunk:
+            return self.done
+        self.text += chunk
+        text = self.text
+        while self._pos < len(text):
+            ch = text[self._pos]
+            if ch == "F" and not self._in_string:
+                rest = text[self._pos:self._pos + len(FINAL_MARKER)]
+                if rest == FINAL_MARKER:
+                    # everything before the marker is prose: start over right after it
+                    self._reset()
+                    self._pos += len(FINAL_MARKER)
+                    continue
+                if FINAL_MARKER.startswith(rest):
+                    break  # possibly a marker split across chunks: wait for more text
+            self._pos += 1
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = self._depth > 0
+            elif ch == "{":
+                if self._depth == 0:
+                    self._start = self._pos - 1
+                self._depth += 1
+            elif ch == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    if self._accept(text[self._start:self._pos]):
+                        return True
+                    self._reset()
+        return False
+
+    def _accept(self, candidate):
+        try:
+            obj = json.loads(candidate)
+        except ValueError:
+            return False
+        if isinstance(obj, dict) and "commands" in obj:
+            self.result = obj
+            return True
+        return False
+
+
+def extract_commands(text):
+    """The first {"commands": ...} object in a complete response, or None."""
+    ex = CommandExtractor()
+    ex.feed(text if isinstance(text, str) else str(text))
+    return ex.result
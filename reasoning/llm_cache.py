@@ -0,0 +1,108 @@
+# reasoning/llm_cache.py
+import hashlib, json, os, sqlite3, threading, time
+
+
+def normalize_messages(messages):
+    """Canonical form of a chat message list: lower-cased roles, \\n line endings, stripped content."""
+    out = []
+    for m in messages or []:
+        content = m.get("content", "")
+        if not isinstance(content, str):
+            content = json.dumps(content, sort_keys=True, ensure_ascii=False)
+        content = content.replace("\r\n", "\n").strip()
+        out.append({"role": str(m.get("role", "user")).lower(), "content": content})
+    return out
+
+
+def cache_key(provider, model, messages, **params):
+    """sha256 over provider, model, normalized messages and sampling parameters (None values dropped)."""
+    ident = {
+        "provider": provider,
+        "model": model,
+        "messages": normalize_messages(messages),
+        "params": {k: v for k, v in params.items() if v is not None},
+    }
+    blob = json.dumps(ident, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Disk-backed chat-completion cache: one SQLite table keyed by cache_key(),
+    shared by every process of a sweep (WAL mode). Entries older than `ttl`
+    seconds are treated as misses and dropped; when the table grows past
+    `max_entries`, the least recently used entries are evicted. Hit/miss
+    counters are per process; `stats()` also reports the table size.
+    """
+    def __init__(self, path=".cache/llm_cache.sqlite", max_entries=100_000, ttl=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = self.misses = self.evictions = self.expired = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY, provider TEXT, model TEXT, response TEXT,
+                created REAL, last_used REAL);
+            CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_used);
+        """)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock, self.conn:
+            row = self.conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.expired += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, response, provider=None, model=None):
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, provider, model, response, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, provider, model, response, now, now),
+            )
+            self._evict()
+
+    def _evict(self):
+        if self.max_entries is None:
+            return
+        (n,) = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        extra = n - self.max_entries
+        if extra > 0:
+            self.conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                (extra,),
+            )
+            self.evictions += extra
+
+    def clear(self):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM responses")
+
+    def stats(self):
+        with self._lock:
+            (size,) = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "size": size,
+        }
+
+    def close(self):
+        self.conn.close()
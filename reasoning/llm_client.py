@@ -1,29 +1,212 @@
 \
 import os
+from .llm_cache import LLMCache, cache_key
 
-def llm_complete(prompt: str, model: str = None, temperature: float = 0.2) -> str:
-    provider = os.getenv("LLM_PROVIDER", "mock").lower()
-    if provider == "groq":
-        try:
+DEFAULT_MODELS = {"groq": "llama-3.3-70b-versatile", "gemini": "gemini-1.5-flash"}
+MOCK_RESPONSE = "FinalAnswer: {\"commands\": \"USE_FALLBACK_HEURISTIC\"}"
+
+_cache = None
+
+def get_cache():
+    """
+    Process-wide response cache, configured from the environment:
+      LLM_CACHE=0 disables it, LLM_CACHE_PATH (default .cache/llm_cache.sqlite),
+      LLM_CACHE_TTL (seconds, default none), LLM_CACHE_MAX (entries, default 100000).
+    """
+    global _cache
+    if os.getenv("LLM_CACHE", "1") == "0":
+        return None
+    if _cache is None:
+        ttl = os.getenv("LLM_CACHE_TTL")
+        _cache = LLMCache(
+            path=os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite"),
+            max_entries=int(os.getenv("LLM_CACHE_MAX", "100000")),
+            ttl=float(ttl) if ttl else None,
+        )
+    return _cache
+
+def cache_stats():
+    cache = get_cache()
+    return cache.stats() if cache is not None else {"hits": 0, "misses": 0, "hit_rate": 0.0,
+                                                     "evictions": 0, "expired": 0, "size": 0}
+
+# provider SDK clients, created once per process and reused by every call
+_clients = {}
+
+def _client(provider):
+    if provider not in _clients:
+        if provider == "groq":
             from groq import Groq
-            client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-            resp = client.chat.completions.create(
-                model=model or "llama-3.3-70b-versatile",
-                messages=[{"role":"system","content":"You are a rigorous crisis planner."},
-                          {"role":"user","content":prompt}],
-                temperature=temperature,
-            )
-            return resp.choices[0].message.content
-        except Exception as e:
-            return f"FinalAnswer: ERROR calling Groq: {e}"
-    elif provider == "gemini":
-        try:
+            _clients[provider] = Groq(api_key=os.getenv("GROQ_API_KEY"))
+        elif provider == "gemini":
             import google.generativeai as genai
             genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-            mdl = genai.GenerativeModel(model or "gemini-1.5-flash")
-            resp = mdl.generate_content(prompt)
-            return resp.text
-        except Exception as e:
-            return f"FinalAnswer: ERROR calling Gemini: {e}"
-    else:
-        return "FinalAnswer: {\"commands\": \"USE_FALLBACK_HEURISTIC\"}"
+            _clients[provider] = genai
+    return _clients[provider]
+
+# provider-side prompt caching: prefix tokens the providers reported as served from their cache
+prefix_stats = {"calls": 0, "prefix_tokens": 0, "provider_cached_tokens": 0}
+
+# Gemini context caching only accepts prefixes above a minimum size
+GEMINI_MIN_CACHE_TOKENS = int(os.getenv("GEMINI_MIN_CACHE_TOKENS", "32768"))
+_gemini_cached = {}   # {(model, prefix.key): GenerativeModel bound to the cached prefix, or None if unavailable}
+
+def _complete_groq(messages, model, temperature, max_tokens, prefix=None):
+    # Groq caches shared prompt prefixes automatically; keeping the static prefix first is all it needs
+    resp = _client("groq").chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+    )
+    details = getattr(getattr(resp, "usage", None), "prompt_tokens_details", None)
+    prefix_stats["provider_cached_tokens"] += getattr(details, "cached_tokens", None) or 0
+    return resp.choices[0].message.content
+
+def _stream_groq(messages, model, temperature, max_tokens, prefix=None):
+    """Yields the completion's text deltas; closing the generator closes the HTTP stream."""
+    stream = _client("groq").chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        stream=True,
+    )
+    try:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        stream.close()
+
+def _gemini_prefix_model(genai, model, prefix):
+    key = (model, prefix.key)
+    if key not in _gemini_cached:
+        try:
+            import datetime
+            from google.generativeai import caching
+            system = "\n\n".join(m["content"] for m in prefix.messages if m["role"] == "system") or None
+            contents = [{"role": "model" if m["role"] == "assistant" else "user", "parts": [m["content"]]}
+                        for m in prefix.messages if m["role"] != "system"]
+            cached = caching.CachedContent.create(model=f"models/{model}", system_instruction=system,
+                                                  contents=contents or None, ttl=datetime.timedelta(hours=1))
+            _gemini_cached[key] = genai.GenerativeModel.from_cached_content(cached_content=cached)
+        except Exception:
+            _gemini_cached[key] = None
+    return _gemini_cached[key]
+
+def _gemini_request(messages, model, temperature, max_tokens, prefix=None):
+    """(GenerativeModel, contents, generation_config) for one Gemini call."""
+    genai = _client("gemini")
+    mdl = None
+    if prefix is not None and prefix.n_tokens >= GEMINI_MIN_CACHE_TOKENS:
+        mdl = _gemini_prefix_model(genai, model, prefix)
+    if mdl is not None:
+        messages = messages[len(prefix.messages):]
+        prefix_stats["provider_cached_tokens"] += prefix.n_tokens
+    system = "\n\n".join(m["content"] for m in messages if m["role"] == "system") or None
+    contents = [{"role": "model" if m["role"] == "assistant" else "user", "parts": [m["content"]]}
+                for m in messages if m["role"] != "system"]
+    if mdl is None:
+        mdl = genai.GenerativeModel(model, system_instruction=system)
+    config = {"temperature": temperature}
+    if max_tokens is not None:
+        config["max_output_tokens"] = max_tokens
+    return mdl, contents, config
+
+def _complete_gemini(messages, model, temperature, max_tokens, prefix=None):
+    mdl, contents, config = _gemini_request(messages, model, temperature, max_tokens, prefix=prefix)
+    resp = mdl.generate_content(contents, generation_config=config)
+    return resp.text
+
+def _stream_gemini(messages, model, temperature, max_tokens, prefix=None):
+    """Yields the completion's text chunks; dropping the generator stops reading the stream."""
+    mdl, contents, config = _gemini_request(messages, model, temperature, max_tokens, prefix=prefix)
+    for chunk in mdl.generate_content(contents, generation_config=config, stream=True):
+        if chunk.parts:
+            yield chunk.text
+
+_PROVIDERS = {"groq": _complete_groq, "gemini": _complete_gemini}
+_STREAMERS = {"groq": _stream_groq, "gemini": _stream_gemini}
+
+# streamed calls, and how many of them were cut short once `until` had what it needed
+stream_stats = {"calls": 0, "cancelled": 0}
+
+# async_client.SharedLLMClient that call_llm sends its requests through while one is open
+_shared_client = None
+
+def set_shared_client(client):
+    """Route call_llm through `client` (None to stop); returns the previously set client."""
+    global _shared_client
+    previous, _shared_client = _shared_client, client
+    return previous
+
+def _consume(chunks, until):
+    """Join streamed chunks, stopping (and closing the stream) as soon as until(chunk) is true."""
+    stream_stats["calls"] += 1
+    parts = []
+    try:
+        for piece in chunks:
+            parts.append(piece)
+            if until(piece):
+                stream_stats["cancelled"] += 1
+                break
+    finally:
+        chunks.close()
+    return "".join(parts)
+
+def call_llm(messages, temperature: float = 0.2, max_tokens: int = None, model: str = None,
+             provider: str = None, use_cache: bool = True, prefix=None, until=None) -> str:
+    """
+    Single chat-completion entry point. `messages` are {"role","content"} dicts.
+    Responses of real providers are cached on disk (see get_cache), keyed by
+    provider, model, normalized messages and sampling parameters; errors are
+    returned as "FinalAnswer: ERROR ..." text and never cached. `prefix` (a
+    prompts.PromptPrefix that `messages` start with) enables provider-side
+    prompt caching of that prefix where the provider supports it.
+    With `until` (a callable fed each text chunk, e.g.
+    json_stream.CommandExtractor().feed) the completion is streamed and
+    cancelled once it returns true; the text received so far is returned
+    and cached. LLM_STREAM=0 turns streaming off.
+    While an async_client.SharedLLMClient for the provider is open, the
+    request goes through it instead (its concurrency, rate, timeout and retry
+    limits apply; no streaming or provider prefix caching).
+    """
+    provider = (provider or os.getenv("LLM_PROVIDER", "mock")).lower()
+    complete = _PROVIDERS.get(provider)
+    if complete is None:
+        return MOCK_RESPONSE
+    model = model or DEFAULT_MODELS[provider]
+    messages = [{"role": m.get("role", "user"), "content": m.get("content", "")} for m in messages]
+    shared = _shared_client
+    if shared is not None and use_cache and shared.accepts(provider, model):
+        return shared.complete(messages, temperature=temperature, max_tokens=max_tokens)
+
+    cache = get_cache() if use_cache else None
+    key = None
+    if cache is not None:
+        key = cache_key(provider, model, messages, temperature=temperature, max_tokens=max_tokens)
+        hit = cache.get(key)
+        if hit is not None:
+            return hit
+    try:
+        if prefix is not None:
+            prefix_stats["calls"] += 1
+            prefix_stats["prefix_tokens"] += prefix.n_tokens
+        if until is not None and provider in _STREAMERS and os.getenv("LLM_STREAM", "1") != "0":
+            text = _consume(_STREAMERS[provider](messages, model, temperature, max_tokens, prefix=prefix), until)
+        else:
+            text = complete(messages, model, temperature, max_tokens, prefix=prefix)
+    except Exception as e:
+        return f"FinalAnswer: ERROR calling {provider.capitalize()}: {e}"
+    if cache is not None and text is not None:
+        cache.put(key, text, provider=provider, model=model)
+    return text
+
+def llm_complete(prompt: str, model: str = None, temperature: float = 0.2) -> str:
+    return call_llm(
+        [{"role": "system", "content": "You are a rigorous crisis planner."},
+         {"role": "user", "content": prompt}],
+        temperature=temperature,
+        model=model,
+    )
@@ -1,31 +1,47 @@
 # reasoning/plan_execute.py
 from typing import Dict, Any
 from .llm_client import call_llm
-import json, re
+from .context_encoder import CONTEXT_LEGEND, encode_context
+from .prompts import PromptPrefix
+from .json_stream import CommandExtractor, extract_commands
+import os
 
 SYSTEM = "You are a planner for a crisis grid world. Plan first in text, then output STRICT FINAL_JSON per schema."
 
-USER = """High-level instruction:
+# Fixed instructions: part of the static prompt prefix, identical on every call
+INSTRUCTIONS = f"""High-level instruction:
 Draft a short step-by-step plan for the next tick only (brief).
 Then produce FINAL_JSON with concrete commands for this tick.
 
-Context:
-{context_json}
+The context arrives as compact JSON ({CONTEXT_LEGEND}).
 
 Schema reminder (STRICT):
 {{"commands":[{{"agent_id":"<id>","type":"move","to":[x,y]}},{{"agent_id":"<id>","type":"act","action_name":"pickup_survivor|drop_at_hospital|extinguish_fire|clear_rubble|recharge|resupply"}}]}}
+Multi-tick commands (kept over the next ticks until done or invalid):
+{{"agent_id":"<id>","type":"route","waypoints":[[x,y],...],"then":"<action, optional>"}}
+{{"agent_id":"<id>","type":"rescue","survivor_id":"<id>","repeat":true}}  (repeat or no survivor_id: keep rescuing)
+{{"agent_id":"<id>","type":"clear","hazard":"fire|rubble|any","target":[x,y]}}  (trucks: target first, then nearest hazards)
+"""
+
+PREFIX = PromptPrefix([{"role": "system", "content": SYSTEM + "\n\n" + INSTRUCTIONS}])
+
+# Per-tick part, sent after the prefix
+USER = """Context:
+{context_json}
 """
 
 def plan_execute_plan(context: Dict[str, Any], scratchpad: str = "") -> Dict[str, Any]:
-    msgs = [{"role":"system","content":SYSTEM},
-            {"role":"user","content": USER.format(context_json=context)}]
-    if scratchpad:
-        msgs.insert(1, {"role":"assistant","content": f"Notes:\n{scratchpad}"})
-    out = call_llm(messages=msgs, temperature=0.2, max_tokens=600)
-    text = out if isinstance(out, str) else str(out)
-    m = re.findall(r"\{[\s\S]*\}\s*$", text)
-    candidate = m[-1] if m else "{}"
-    try:
-        return json.loads(candidate)
-    except Exception:
-        return {"commands": []}
+    context_json, _ = encode_context(context, token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500")))
+    msgs = PREFIX.build(
+        {"role":"assistant","content": f"Notes:\n{scratchpad}"} if scratchpad else None,
+        {"role":"user","content": USER.format(context_json=context_json)},
+    )
+    prompt_tokens = PREFIX.count(msgs)
+    extractor = CommandExtractor()   # streamed: generation stops once the commands object is complete
+    out = call_llm(messages=msgs, temperature=0.2, max_tokens=600, prefix=PREFIX, until=extractor.feed)
+    # the prose plan comes first; only the FINAL_JSON commands object is kept
+    out = extractor.result if extractor.done else extract_commands(out)
+    if out is None:
+        out = {"commands": []}
+    out["prompt_tokens"] = prompt_tokens
+    return out
@@ -3,6 +3,9 @@ from typing import Dict, Any, List
 from .react import react_plan
 from .reflexion import reflexion_plan
 from .plan_execute import plan_execute_plan  # you'll add this file next
+from .heuristic import heuristic_plan, gate_reasons
+
+FALLBACK = "USE_FALLBACK_HEURISTIC"
 
 VALID_ACTIONS = {
     "pickup_survivor",
@@ -13,6 +16,8 @@ VALID_ACTIONS = {
     "resupply",
 }
 
+MAX_WAYPOINTS = 32
+
 def _validate_action_json(cmd_json: Dict[str, Any]) -> Dict[str, Any]:
     # Expect: {"commands": [ ... ]}
     if not isinstance(cmd_json, dict) or "commands" not in cmd_json:
@@ -32,23 +37,92 @@ def _validate_action_json(cmd_json: Dict[str, Any]) -> Dict[str, Any]:
             action = str(c.get("action_name", "")).strip()
             if agent_id and action in VALID_ACTIONS:
                 normed.append({"agent_id": agent_id, "type": "act", "action_name": action})
+        elif ctype == "route":
+            # multi-tick: walk through waypoints, optionally act at the last one
+            wps = c.get("waypoints")
+            if agent_id and isinstance(wps, (list, tuple)) and 0 < len(wps) <= MAX_WAYPOINTS \
+                    and all(isinstance(w, (list, tuple)) and len(w) == 2 for w in wps):
+                cmd = {"agent_id": agent_id, "type": "route", "waypoints": [[int(w[0]), int(w[1])] for w in wps]}
+                then = c.get("then")
+                if then in VALID_ACTIONS:
+                    cmd["then"] = then
+                if c.get("direct") is True:
+                    cmd["direct"] = True
+                normed.append(cmd)
+        elif ctype == "rescue":
+            # multi-tick: go to survivor, pick up, deliver to the nearest hospital (no survivor_id: keep rescuing)
+            if agent_id:
+                cmd = {"agent_id": agent_id, "type": "rescue"}
+                sid = str(c.get("survivor_id") or "").strip()
+                if sid:
+                    cmd["survivor_id"] = sid
+                if c.get("repeat") is True:
+                    cmd["repeat"] = True
+                if c.get("direct") is True:
+                    cmd["direct"] = True
+                normed.append(cmd)
+        elif ctype == "clear":
+            # multi-tick: keep extinguishing / clearing the nearest hazards, `target` first
+            hazard = c.get("hazard", "any")
+            target = c.get("target")
+            if agent_id and hazard in ("fire", "rubble", "any"):
+                cmd = {"agent_id": agent_id, "type": "clear", "hazard": hazard}
+                if isinstance(target, (list, tuple)) and len(target) == 2:
+                    cmd["target"] = [int(target[0]), int(target[1])]
+                if c.get("direct") is True:
+                    cmd["direct"] = True
+                normed.append(cmd)
         # silently drop malformed commands
     return {"commands": normed}
 
-def make_plan(context: Dict[str, Any], strategy: str, scratchpad: str = "") -> Dict[str, Any]:
-    strategy = (strategy or "react").lower()
+def _llm_plan(context: Dict[str, Any], strategy: str, scratchpad: str) -> Dict[str, Any]:
     if strategy == "react":
-        out = react_plan(context, scratchpad=scratchpad)
+        return react_plan(context, scratchpad=scratchpad)
     elif strategy == "reflexion":
-        out = reflexion_plan(context, scratchpad=scratchpad)
+        return reflexion_plan(context, scratchpad=scratchpad)
     elif strategy in ("plan_execute", "plan-and-execute", "planexecute"):
-        out = plan_execute_plan(context, scratchpad=scratchpad)
+        return plan_execute_plan(context, scratchpad=scratchpad)
     else:
         # default to react
-        out = react_plan(context, scratchpad=scratchpad)
+        return react_plan(context, scratchpad=scratchpad)
 
-    try:
-        return _validate_action_json(out)
-    except Exception:
-        # single retry hook – caller (main loop) should count invalid_json and trigger one re-prompt if desired
-        return {"commands": []}
+def make_plan(context: Dict[str, Any], strategy: str, scratchpad: str = "", memory: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    One tick's {"commands": [...]} for `strategy`:
+      - "heuristic": reasoning/heuristic.py only, no LLM call;
+      - "hybrid_<strategy>": the heuristic plan on routine ticks, the LLM
+        strategy only when gate_reasons() fires (needs the per-episode
+        `memory` dict the caller keeps across ticks);
+      - anything else: the LLM strategy, with the heuristic standing in when
+        the client answers USE_FALLBACK_HEURISTIC (mock provider).
+    The result also says which planner produced it ("planner": "llm" or
+    "heuristic") and, for hybrid strategies, why the LLM was called ("gate").
+    """
+    strategy = (strategy or "react").lower()
+    if strategy == "heuristic":
+        return dict(heuristic_plan(context), planner="heuristic")
+
+    gate = None
+    if strategy.startswith("hybrid_"):
+        strategy = strategy[len("hybrid_"):]
+        blocked = []
+        fallback = heuristic_plan(context, blocked=blocked)
+        gate = gate_reasons(context, memory if memory is not None else {}, blocked)
+        if not gate:
+            return dict(fallback, planner="heuristic", gate=[])
+
+    out = _llm_plan(context, strategy, scratchpad)
+    if isinstance(out, dict) and out.get("commands") == FALLBACK:
+        plan = dict(heuristic_plan(context), planner="heuristic")
+    else:
+        try:
+            plan = _validate_action_json(out)
+            if isinstance(out.get("prompt_tokens"), int):
+                plan["prompt_tokens"] = out["prompt_tokens"]
+        except Exception:
+            # single retry hook – caller (main loop) should count invalid_json and trigger one re-prompt if desired
+            plan = {"commands": []}
+        plan["planner"] = "llm"
+    if gate is not None:
+        plan["gate"] = gate
+    return plan
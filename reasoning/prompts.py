@@ -0,0 +1,33 @@
+# reasoning/prompts.py
+import hashlib, json
+from .context_encoder import count_message_tokens
+
+
+class PromptPrefix:
+    """
+    The fixed leading messages of a planner prompt (instructions, schema,
+    constraints). Planners put it first, byte-identical on every call, with
+    the per-tick state after it, so provider-side prefix caches (automatic on
+    Groq, context caching on Gemini) can reuse it. Locally its token count is
+    computed once and reused by count(); `key` identifies it for the client.
+    """
+    def __init__(self, messages):
+        self.messages = tuple({"role": m["role"], "content": m["content"]} for m in messages)
+        blob = json.dumps(self.messages, sort_keys=True, ensure_ascii=False)
+        self.key = hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+        self._n_tokens = None
+
+    @property
+    def n_tokens(self):
+        if self._n_tokens is None:
+            self._n_tokens = count_message_tokens(self.messages)
+        return self._n_tokens
+
+    def build(self, *dynamic):
+        """Full message list: the prefix followed by this call's messages."""
+        return [dict(m) for m in self.messages] + [m for m in dynamic if m]
+
+    def count(self, messages):
+        """Token count of build(...) output, tokenizing only the messages after the prefix."""
+        return self.n_tokens + count_message_tokens(messages[len(self.messages):])
+
@@ -1,6 +1,10 @@
 # reasoning/react.py
+import os
 from typing import Dict, Any
 from .llm_client import call_llm
+from .context_encoder import CONTEXT_LEGEND, encode_context
+from .prompts import PromptPrefix
+from .json_stream import CommandExtractor, extract_commands
 
 SYSTEM_PROMPT = """You are a disaster-response planner operating a grid simulation.
 Decide only via LLM reasoning (no rules). Output STRICT JSON matching:
@@ -11,39 +15,51 @@ Decide only via LLM reasoning (no rules). Output STRICT JSON matching:
 Do NOT include any extra keys or text outside JSON for your final answer.
 """
 
-USER_TEMPLATE = """Context (JSON, truncated):
-{context_json}
+ALLOWED = ["pickup_survivor","drop_at_hospital","extinguish_fire","clear_rubble","recharge","resupply"]
 
-Allowed actions & schema:
+# Fixed instructions: part of the static prompt prefix, identical on every call
+INSTRUCTIONS = f"""Allowed actions & schema:
 - move -> to: [x,y]
-- act  -> action_name in {allowed}
+- act  -> action_name in {ALLOWED}
+Multi-tick commands (kept and executed over the next ticks until done or invalid; prefer them):
+- {{"agent_id":"<id>","type":"route","waypoints":[[x,y],...],"then":"<action>"}} ("then" optional)
+- {{"agent_id":"<id>","type":"rescue","survivor_id":"<id>","repeat":true}} (medics: fetch survivor, deliver to nearest hospital; with repeat or without survivor_id, keep rescuing the nearest ones)
+- {{"agent_id":"<id>","type":"clear","hazard":"fire|rubble|any","target":[x,y]}} (trucks: extinguish/clear target, then keep clearing the nearest hazards)
 
 Constraints:
 - Prefer rescuing nearby survivors; keep agents safe; respect obstacles & capacities.
 - Use recharge/resupply if low battery/resources (if provided in state).
+
+The context arrives as compact JSON ({CONTEXT_LEGEND}).
 Return ONLY FINAL_JSON for the final message."""
 
+PREFIX = PromptPrefix([{"role": "system", "content": SYSTEM_PROMPT + "\n" + INSTRUCTIONS}])
+
+# Per-tick part, sent after the prefix
+USER_TEMPLATE = """Context:
+{context_json}"""
+
 def react_plan(context: Dict[str, Any], scratchpad: str = "") -> Dict[str, Any]:
-    allowed = ["pickup_survivor","drop_at_hospital","extinguish_fire","clear_rubble","recharge","resupply"]
-    user = USER_TEMPLATE.format(context_json=context, allowed=allowed)
+    context_json, _ = encode_context(context, token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500")))
+    messages = PREFIX.build(
+        {"role": "assistant", "content": f"Notes:\n{scratchpad}"} if scratchpad else None,
+        {"role": "user", "content": USER_TEMPLATE.format(context_json=context_json)},
+    )
 
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": user},
-    ]
-    if scratchpad:
-        messages.insert(1, {"role": "assistant", "content": f"Notes:\n{scratchpad}"})
+    prompt_tokens = PREFIX.count(messages)
 
     # Call provider (Groq/Gemini/etc.) via your llm_client.py
-    raw = call_llm(messages=messages, temperature=0.2, max_tokens=500)
-
-    # Expect model to include a JSON block. If the provider wraps it, try to extract.
-    import json, re
-    text = raw if isinstance(raw, str) else str(raw)
-    # Try strict extraction: the largest {...} block at the end
-    m = re.findall(r"\{[\s\S]*\}\s*$", text)
-    candidate = m[-1] if m else "{}"
-    try:
-        return json.loads(candidate)
-    except Exception:
-        return {"commands": []}
+    extractor = CommandExtractor()   # streamed: generation stops once the commands object is complete
+    raw = call_llm(messages=messages, temperature=0.2, max_tokens=500, prefix=PREFIX, until=extractor.feed)
+
+    # The first complete {"commands": ...} object, wherever the provider put it (cached replies are scanned whole)
+    out = extractor.result if extractor.done else extract_commands(raw)
+    if out is None:
+        out = {"commands": []}
+    out["prompt_tokens"] = prompt_tokens
+    return out
+
+def mock_react_with_tools(context: Dict[str, Any]) -> Dict[str, Any]:
+    """Offline stand-in used by the GUI auto-plan: the deterministic heuristic planner (routing tools, no LLM)."""
+    from .heuristic import heuristic_plan
+    return heuristic_plan(context)
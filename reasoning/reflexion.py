@@ -26,3 +26,11 @@ def critique_and_update(transcript: str):
     mem["rules"] = mem["rules"][-5:]
     save_rules(mem)
     return txt
+
+def reflexion_plan(context, scratchpad: str = ""):
+    """ReAct planning with the rules kept by critique_and_update() prepended to the notes."""
+    from .react import react_plan
+    rules = load_rules().get("rules", [])
+    if rules:
+        scratchpad = "Rules from past critiques:\n" + "\n".join(rules) + ("\n\n" + scratchpad if scratchpad else "")
+    return react_plan(context, scratchpad=scratchpad)
@@ -0,0 +1,172 @@
+# tools/distance_field.py
+from collections import deque
+from heapq import heappush, heappop
+from tools.routing import _passable_fn
+
+INF = float("inf")
+
+
+class DistanceField:
+    """
+    Multi-source BFS distance map ("Dijkstra map") on the 4-connected grid:
+    dist(cell) = steps to the nearest target, avoiding cell types in `avoid`.
+    Targets always count as sources. The owning model calls on_cell_changed()
+    for every cell mutation; only the cells whose distance can change are
+    recomputed (decrease-propagation on unblock, support-loss repair on block).
+    """
+    def __init__(self, model_like, targets, avoid=("fire", "rubble")):
+        self.model = model_like
+        self.W, self.H = model_like.width, model_like.height
+        self.avoid = frozenset(avoid)
+        self.targets = {tuple(t) for t in targets if 0 <= t[0] < self.W and 0 <= t[1] < self.H}
+        self._target_idx = {y * self.W + x for (x, y) in self.targets}
+        self.rebuild()
+
+    # ----------------- queries -----------------
+    def _dist_at(self, i):
+        # like shortest_path, an agent may *start* on a blocked cell (e.g. a truck on a fire)
+        d = self.dist[i]
+        if d == INF and not self._is_open(i):
+            d = min((self.dist[j] for j in self._neighbours(i)), default=INF) + 1
+        return d
+
+    def distance(self, pos):
+        """Steps from pos to the nearest target, or None if unreachable."""
+        d = self._dist_at(pos[1] * self.W + pos[0])
+        return None if d == INF else d
+
+    def next_step(self, pos):
+        """Neighbour one step closer to the nearest target (None at a target or if unreachable)."""
+        i = pos[1] * self.W + pos[0]
+        d = self._dist_at(i)
+        if d == INF or d == 0:
+            return None
+        for j in self._neighbours(i):
+            if self.dist[j] == d - 1:
+                return (j % self.W, j // self.W)
+        return None
+
+    def path(self, pos):
+        """Cells from pos to the nearest target (inclusive), or [] if unreachable."""
+        if self.distance(pos) is None:
+            return []
+        cur = tuple(pos)
+        out = [cur]
+        while cur not in self.targets:
+            cur = self.next_step(cur)
+            out.append(cur)
+        return out
+
+    def nearest_target(self, pos):
+        p = self.path(pos)
+        return p[-1] if p else None
+
+    # ----------------- maintenance -----------------
+    def rebuild(self):
+        W, H = self.W, self.H
+        self._passable = _passable_fn(self.model.cell_types, self.avoid)
+        self.dist = [INF] * (W * H)
+        q = deque()
+        for i in self._target_idx:
+            self.dist[i] = 0
+            q.append(i)
+        self._bfs(q)
+
+    def on_cell_changed(self, x, y, old, new):
+        was_open = old not in self.avoid
+        now_open = new not in self.avoid
+        if was_open == now_open:
+            return
+        i = y * self.W + x
+        if i in self._target_idx:
+            return
+        if now_open:
+            self._on_opened(i)
+        else:
+            self._on_blocked(i)
+
+    def _neighbours(self, i):
+        W = self.W
+        x, y = i % W, i // W
+        if x > 0: yield i - 1
+        if x < W - 1: yield i + 1
+        if y > 0: yield i - W
+        if y < self.H - 1: yield i + W
+
+    def _is_open(self, i):
+        return i in self._target_idx or self._passable(i % self.W, i // self.W)
+
+    def _bfs(self, q):
+        dist = self.dist
+        while q:
+            u = q.popleft()
+            nd = dist[u] + 1
+            for w in self._neighbours(u):
+                if nd < dist[w] and self._is_open(w):
+                    dist[w] = nd
+                    q.append(w)
+
+    def _on_opened(self, i):
+        best = min((self.dist[j] for j in self._neighbours(i)), default=INF)
+        if best == INF:
+            return
+        self.dist[i] = best + 1
+        self._bfs(deque([i]))
+
+    def _on_blocked(self, i):
+        dist = self.dist
+        if dist[i] == INF:
+            return
+        dist[i] = INF
+        # cells that lost every neighbour one step closer to a target
+        affected = set()
+        stack = list(self._neighbours(i))
+        while stack:
+            u = stack.pop()
+            du = dist[u]
+            if u in affected or u in self._target_idx or du == INF:
+                continue
+            if any(dist[w] == du - 1 and w not in affected for w in self._neighbours(u)):
+                continue
+            affected.add(u)
+            stack.extend(w for w in self._neighbours(u) if dist[w] == du + 1)
+        if not affected:
+            return
+        for u in affected:
+            dist[u] = INF
+        # re-seed the affected region from its intact boundary
+        heap = []
+        for u in affected:
+            d = min((dist[w] for w in self._neighbours(u)), default=INF)
+            if d != INF:
+                heappush(heap, (d + 1, u))
+        while heap:
+            d, u = heappop(heap)
+            if d >= dist[u]:
+                continue
+            dist[u] = d
+            for w in self._neighbours(u):
+                if w in affected and d + 1 < dist[w]:
+                    heappush(heap, (d + 1, w))
+
+
+def nearest_facility(model, pos, kind="hospital"):
+    """
+    Tool: true travel distance and next step from `pos` to the nearest
+    facility of `kind` ("hospital" or "depot"), looked up in the model's
+    maintained distance field. `cost` follows shortest_path (cells on the path).
+    """
+    field = model.distance_field(kind)
+    if field is None:
+        return {"status": "error", "reason": "unknown_facility"}
+    pos = tuple(pos)
+    d = field.distance(pos)
+    if d is None:
+        return {"status": "blocked", "target": None, "cost": None, "next_step": None}
+    step = field.next_step(pos)
+    return {
+        "status": "ok",
+        "target": list(field.nearest_target(pos)),
+        "cost": d + 1,
+        "next_step": list(step) if step else None,
+    }
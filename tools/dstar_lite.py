@@ -0,0 +1,149 @@
+# tools/dstar_lite.py
+from heapq import heappush, heappop
+from tools.routing import manhattan, _passable_fn
+
+INF = float("inf")
+_DIRS = [(1,0),(-1,0),(0,1),(0,-1)]
+
+
+class DStarLiteRoute:
+    """
+    Persistent start->goal route repaired incrementally with D* Lite
+    (Koenig & Likhachev, 2002). The search runs backward from the goal, so
+    when cells change type (the owning model calls on_cell_changed()) or the
+    agent moves (update_start()), only the affected part of the search is
+    redone on the next plan()/next_step() call.
+    Same costs as shortest_path: entering a cell in `avoid` is forbidden, the
+    start cell itself may be blocked, and plan() returns {"status","path","cost"}.
+    """
+    def __init__(self, model_like, start, goal, avoid=("fire","rubble")):
+        self.model = model_like
+        self.W, self.H = model_like.width, model_like.height
+        self.avoid = frozenset(avoid)
+        self.start = tuple(start)
+        self.goal = tuple(goal)
+        self._passable = _passable_fn(model_like.cell_types, self.avoid)
+        self.expansions = 0   # total vertex expansions, initial search + repairs
+
+        self.g = {}
+        self.rhs = {self.goal: 0}
+        self.km = 0
+        self._last = self.start
+        self._heap = []
+        self._queued = {}     # node -> current key (lazy deletion in _heap)
+        self._dirty = set()   # cells whose passability changed since last repair
+        self._push(self.goal)
+
+    # ----------------- public API -----------------
+    def on_cell_changed(self, x, y, old, new):
+        if (old in self.avoid) != (new in self.avoid):
+            self._dirty.add((x, y))
+
+    def update_start(self, pos):
+        self.start = tuple(pos)
+
+    def plan(self):
+        self._repair()
+        if self.start == self.goal:
+            return {"status":"ok","path":[self.start],"cost":1}
+        if self._g(self.start) == INF:
+            return {"status":"blocked","path":[], "cost": None}
+        path = [self.start]
+        cur = self.start
+        while cur != self.goal:
+            cur = self._best_succ(cur)
+            if cur is None or len(path) > self.W * self.H:
+                return {"status":"blocked","path":[], "cost": None}
+            path.append(cur)
+        return {"status":"ok","path":path,"cost":len(path)}
+
+    def next_step(self):
+        """Next cell to move to, or None if at the goal / unreachable."""
+        self._repair()
+        if self.start == self.goal or self._g(self.start) == INF:
+            return None
+        return self._best_succ(self.start)
+
+    # ----------------- D* Lite internals -----------------
+    def _g(self, s):
+        return self.g.get(s, INF)
+
+    def _rhs(self, s):
+        return self.rhs.get(s, INF)
+
+    def _key(self, s):
+        m = min(self._g(s), self._rhs(s))
+        return (m + manhattan(self.start, s) + self.km, m)
+
+    def _push(self, s):
+        k = self._key(s)
+        self._queued[s] = k
+        heappush(self._heap, (k, s))
+
+    def _top_key(self):
+        while self._heap:
+            k, s = self._heap[0]
+            if self._queued.get(s) == k:
+                return k
+            heappop(self._heap)
+        return (INF, INF)
+
+    def _neighbours(self, s):
+        x, y = s
+        for dx, dy in _DIRS:
+            nx, ny = x+dx, y+dy
+            if 0 <= nx < self.W and 0 <= ny < self.H:
+                yield (nx, ny)
+
+    def _cost(self, v):
+        # cost of entering v
+        return 1 if self._passable(*v) else INF
+
+    def _best_succ(self, s):
+        best, best_v = INF, None
+        for v in self._neighbours(s):
+            c = self._cost(v) + self._g(v)
+            if c < best:
+                best, best_v = c, v
+        return best_v
+
+    def _update_vertex(self, u):
+        if u != self.goal:
+            self.rhs[u] = min((self._cost(v) + self._g(v) for v in self._neighbours(u)), default=INF)
+        self._queued.pop(u, None)
+        if self._g(u) != self._rhs(u):
+            self._push(u)
+
+    def _compute(self):
+        while self._top_key() < self._key(self.start) or self._rhs(self.start) != self._g(self.start):
+            if not self._heap:
+                break
+            k_old, u = heappop(self._heap)
+            if self._queued.get(u) != k_old:
+                continue
+            del self._queued[u]
+            self.expansions += 1
+            k_new = self._key(u)
+            if k_old < k_new:
+                self._push(u)
+            elif self._g(u) > self._rhs(u):
+                self.g[u] = self._rhs(u)
+                for p in self._neighbours(u):
+                    self._update_vertex(p)
+            else:
+                self.g[u] = INF
+                self._update_vertex(u)
+                for p in self._neighbours(u):
+                    self._update_vertex(p)
+
+    def _repair(self):
+        if self.start != self._last:
+            self.km += manhattan(self._last, self.start)
+            self._last = self.start
+        if self._dirty:
+            dirty, self._dirty = self._dirty, set()
+            # a changed cell alters the cost of every edge entering it
+            for cell in dirty:
+                for u in self._neighbours(cell):
+                    self._update_vertex(u)
+        self._compute()
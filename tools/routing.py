@@ -1,20 +1,123 @@
 \
 from heapq import heappush, heappop
+from collections import defaultdict
+from env.grid import CELL_CODES, is_compact
 
 def manhattan(a, b): 
     return abs(a[0]-b[0]) + abs(a[1]-b[1])
 
-def shortest_path(model_like, start, goal, avoid=("fire","rubble")):
+def _passable_fn(cell_types, avoid):
+    """passable(x, y) for either grid layout; compact grids compare uint8 codes."""
+    if is_compact(cell_types):
+        codes = cell_types.codes
+        blocked_codes = {CELL_CODES[a] for a in avoid if a in CELL_CODES}
+        return lambda x, y: codes.item(y, x) not in blocked_codes
+    blocked = set(avoid)
+    return lambda x, y: cell_types[y][x] not in blocked
+
+class PathCache:
+    """
+    Memo of shortest_path results keyed by (start, goal, avoid set).
+    The owning model calls on_cell_changed() for every cell mutation; only
+    entries that change can affect are dropped:
+      - a cell becoming blocked drops the cached paths that cross it;
+      - a cell becoming passable drops "blocked" results and the paths it
+        could shorten (Manhattan detour through it below the current cost).
+    """
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self.entries = {}                 # key -> result dict
+        self.by_cell = defaultdict(set)   # (x, y) -> keys whose path crosses it
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(start, goal, avoid):
+        return (tuple(start), tuple(goal), frozenset(avoid))
+
+    def get(self, key):
+        res = self.entries.get(key)
+        if res is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return res
+
+    def put(self, key, result):
+        if key in self.entries:
+            self._drop(key)
+        while len(self.entries) >= self.max_entries:
+            self._drop(next(iter(self.entries)))  # oldest first
+        self.entries[key] = result
+        for cell in result["path"]:
+            self.by_cell[cell].add(key)
+
+    def _drop(self, key):
+        res = self.entries.pop(key, None)
+        if res is None:
+            return
+        for cell in res["path"]:
+            keys = self.by_cell.get(cell)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.by_cell[cell]
+
+    def on_cell_changed(self, x, y, old, new):
+        if not self.entries:
+            return
+        cell = (x, y)
+        stale = set()
+        for key in self.by_cell.get(cell, ()):
+            avoid = key[2]
+            if old not in avoid and new in avoid:
+                stale.add(key)
+        opened = [key for key in self.entries if old in key[2] and new not in key[2]]
+        for key in opened:
+            start, goal, _ = key
+            res = self.entries[key]
+            if res["cost"] is None or manhattan(start, cell) + manhattan(cell, goal) < res["cost"] - 1:
+                stale.add(key)
+        for key in stale:
+            self._drop(key)
+        self.invalidations += len(stale)
+
+    def clear(self):
+        self.entries.clear()
+        self.by_cell.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "invalidations": self.invalidations, "size": len(self.entries)}
+
+def _copy_result(res):
+    return {"status": res["status"], "path": list(res["path"]), "cost": res["cost"]}
+
+def shortest_path(model_like, start, goal, avoid=("fire","rubble"), method="astar"):
     """A* path on 4-connected grid avoiding cell types in `avoid`.
        model_like: object with width, height, cell_types[y][x]
+       method: "astar" (default) or "bidirectional" (bidirectional A*, much
+       fewer expansions on large open maps); both return optimal paths.
+       If model_like has a `path_cache` (PathCache), results are memoized there.
     """
+    search = _SEARCHES.get(method)
+    if search is None:
+        return {"status":"error","reason":"unknown_method","path":[],"cost":None}
+    cache = getattr(model_like, "path_cache", None)
+    if cache is None:
+        return search(model_like, start, goal, avoid)
+    key = PathCache.key(start, goal, avoid)
+    res = cache.get(key)
+    if res is None:
+        res = search(model_like, start, goal, avoid)
+        cache.put(key, res)
+    return _copy_result(res)
+
+def _astar(model_like, start, goal, avoid):
     W, H = model_like.width, model_like.height
     start, goal = tuple(start), tuple(goal)
-    blocked = set(avoid)
-
-    def passable(x, y):
-        ct = model_like.cell_types[y][x]
-        return ct not in blocked
+    passable = _passable_fn(model_like.cell_types, avoid)
 
     openq = []
     heappush(openq, (0+manhattan(start,goal), 0, start, None))
@@ -47,3 +150,123 @@ def shortest_path(model_like, start, goal, avoid=("fire","rubble")):
         if node == start: break
     path.reverse()
     return {"status":"ok","path":path,"cost":len(path)}
+
+def _bidirectional_astar(model_like, start, goal, avoid):
+    """Bidirectional A*: forward search from start, backward from goal, both
+       with Manhattan heuristics and ties broken toward deeper nodes (so the
+       equal-f plateaus of open grids are not flooded). Stops once the best
+       meeting cost mu is <= the smallest f on either open list, which keeps
+       the result optimal for consistent heuristics.
+    """
+    W, H = model_like.width, model_like.height
+    start, goal = tuple(start), tuple(goal)
+    if start == goal:
+        return {"status":"ok","path":[start],"cost":1}
+    passable = _passable_fn(model_like.cell_types, avoid)
+    if not passable(*goal):
+        return {"status":"blocked","path":[], "cost": None}
+
+    # index 0 = forward (from start), 1 = backward (from goal)
+    ends = (goal, start)
+    g = ({start: 0}, {goal: 0})
+    parent = ({start: None}, {goal: None})
+    closed = (set(), set())
+    openq = ([(manhattan(start,goal), 0, start)], [(manhattan(start,goal), 0, goal)])
+    mu, meet = float("inf"), None
+
+    while openq[0] and openq[1]:
+        if mu <= max(openq[0][0][0], openq[1][0][0]):
+            break
+        d = 0 if len(openq[0]) <= len(openq[1]) else 1
+        _, neg_g, cur = heappop(openq[d])
+        gc = -neg_g
+        if cur in closed[d] or gc > g[d][cur]:
+            continue
+        closed[d].add(cur)
+        other = 1 - d
+        x,y = cur
+        for dx,dy in [(1,0),(-1,0),(0,1),(0,-1)]:
+            nxt = (x+dx, y+dy)
+            nx,ny = nxt
+            # the start cell itself may be blocked (agent standing on fire); only reachable backward
+            if not (0<=nx<W and 0<=ny<H) or not (passable(nx,ny) or (d == 1 and nxt == start)):
+                continue
+            ng = gc + 1
+            if ng < g[d].get(nxt, float("inf")):
+                g[d][nxt] = ng
+                parent[d][nxt] = cur
+                heappush(openq[d], (ng+manhattan(nxt, ends[d]), -ng, nxt))
+            if nxt in g[other] and g[d][nxt] + g[other][nxt] < mu:
+                mu = g[d][nxt] + g[other][nxt]
+                meet = nxt
+
+    if meet is None:
+        return {"status":"blocked","path":[], "cost": None}
+    path = []
+    node = meet
+    while node is not None:
+        path.append(node)
+        node = parent[0][node]
+    path.reverse()
+    node = parent[1][meet]
+    while node is not None:
+        path.append(node)
+        node = parent[1][node]
+    return {"status":"ok","path":path,"cost":len(path)}
+
+_SEARCHES = {"astar": _astar, "bidirectional": _bidirectional_astar}
+
+def route_matrix(model_like, sources, targets, avoid=("fire","rubble"), with_paths=False):
+    """Many-to-many routing: travel-cost matrix costs[i][j] from sources[i] to targets[j].
+       Edges are unit cost, so one early-exit BFS per source replaces
+       len(sources) * len(targets) shortest_path calls. Costs follow the
+       shortest_path contract (cells on the path, None if unreachable); with
+       with_paths=True the paths are returned too and stored in the model's
+       path_cache, if any.
+    """
+    W, H = model_like.width, model_like.height
+    passable = _passable_fn(model_like.cell_types, avoid)
+    targets = [tuple(t) for t in targets]
+    cache = getattr(model_like, "path_cache", None) if with_paths else None
+    costs, paths = [], []
+
+    for src in sources:
+        src = tuple(src)
+        came = {src: None}
+        remaining = set(targets) - {src}
+        frontier = [src]
+        while frontier and remaining:
+            nxt = []
+            for cur in frontier:
+                x, y = cur
+                for dx,dy in [(1,0),(-1,0),(0,1),(0,-1)]:
+                    nx,ny = x+dx, y+dy
+                    if 0<=nx<W and 0<=ny<H and (nx,ny) not in came and passable(nx,ny):
+                        came[(nx,ny)] = cur
+                        nxt.append((nx,ny))
+                        remaining.discard((nx,ny))
+            frontier = nxt
+
+        row_costs, row_paths = [], []
+        for tgt in targets:
+            if tgt not in came:
+                res = {"status":"blocked","path":[], "cost": None}
+            else:
+                node, path = tgt, []
+                while node is not None:
+                    path.append(node)
+                    node = came[node]
+                path.reverse()
+                res = {"status":"ok","path":path,"cost":len(path)}
+            row_costs.append(res["cost"])
+            if with_paths:
+                row_paths.append(res["path"])
+                if cache is not None:
+                    cache.put(PathCache.key(src, tgt, avoid), res)
+        costs.append(row_costs)
+        paths.append(row_paths)
+
+    out = {"status":"ok","costs":costs}
+    if with_paths:
+        out["paths"] = paths
+    return out
@@ -1,5 +1,5 @@
 # utils/jsonl_logger.py
-import os, json
+import os, json, gzip, queue, threading
 
 def ensure_dir(path: str):
     os.makedirs(path, exist_ok=True)
@@ -18,3 +18,129 @@ def write_tick_conversation(base_dir: str, strategy: str, run_id: str, tick: int
     with open(fn, "w", encoding="utf-8") as f:
         for line in conversation_lines:
             f.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+
+# ---------------- Buffered per-run logger ----------------
+# verbosity levels
+LOG_OFF = 0     # nothing (no log files are created)
+LOG_PLANS = 1   # per-tick plans
+LOG_STATE = 2   # + per-tick world state
+LOG_FULL = 3    # + full planner conversation
+
+_STOP = object()
+
+class RunLogger:
+    """
+    One append-only JSONL stream per run (optionally gzip-compressed), written
+    by a background thread so the simulation loop never blocks on disk.
+    Records look like {"tick": t, "type": "plan"|"state"|"conversation"|..., ...}.
+    A sidecar index (<path>.idx, JSONL) stores the uncompressed byte offset of
+    each tick's first record, so read_run_log(path, tick=t) can seek to it.
+    With verbosity LOG_OFF no files or thread are created. A write error in
+    the background thread is raised by close().
+    """
+    def __init__(self, path: str, verbosity: int = LOG_STATE, compress: bool = False, flush_every: int = 256):
+        if compress and not path.endswith(".gz"):
+            path += ".gz"
+        self.path = path
+        self.verbosity = verbosity
+        self.flush_every = flush_every
+        self._error = None
+        self._thread = None
+        if verbosity <= LOG_OFF:
+            return
+        ensure_dir(os.path.dirname(path) or ".")
+        opener = gzip.open if compress else open
+        self._f = opener(path, "wt", encoding="utf-8")
+        self._idx = open(path + ".idx", "w", encoding="utf-8")
+        self._q = queue.Queue(maxsize=10000)
+        self._thread = threading.Thread(target=self._writer, name=f"RunLogger:{os.path.basename(path)}", daemon=True)
+        self._thread.start()
+
+    def log(self, tick: int, kind: str, level: int = LOG_PLANS, **payload):
+        """Queue one record if `level` is within the configured verbosity."""
+        if self._thread is not None and level <= self.verbosity:
+            payload["tick"] = tick
+            payload["type"] = kind
+            self._q.put(payload)
+
+    def header(self, **info):
+        """Run metadata (map, seed, ...), written as the first record unless logging is off."""
+        if self._thread is not None:
+            self._q.put(dict(info, tick=-1, type="run"))
+
+    def _writer(self):
+        offset, last_tick, pending = 0, None, 0
+        while True:
+            rec = self._q.get()
+            if rec is _STOP:
+                break
+            try:
+                line = json.dumps(rec, ensure_ascii=False) + "\n"
+                if rec["tick"] != last_tick:
+                    last_tick = rec["tick"]
+                    self._idx.write(json.dumps({"tick": last_tick, "offset": offset}) + "\n")
+                self._f.write(line)
+                offset += len(line.encode("utf-8"))
+                pending += 1
+                if pending >= self.flush_every:
+                    self._f.flush()
+                    self._idx.flush()
+                    pending = 0
+            except Exception as e:  # keep draining so log() never blocks the sim; close() raises it
+                if self._error is None:
+                    self._error = e
+
+    def close(self):
+        if self._thread is None:
+            return
+        if self._thread.is_alive():
+            self._q.put(_STOP)
+            self._thread.join()
+        for f in (self._f, self._idx):
+            try:
+                f.close()
+            except Exception as e:
+                if self._error is None:
+                    self._error = e
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise OSError(f"{self.path}: writing the run log failed: {error}") from error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_run_log(path: str, tick: int = None, start_tick: int = None):
+    """
+    Yield records of a RunLogger stream; with `tick`, only that tick's records,
+    with `start_tick`, every record from that tick on (both seek via the .idx offsets).
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    offset = 0
+    seek = tick if tick is not None else start_tick
+    if seek is not None and os.path.exists(path + ".idx"):
+        with open(path + ".idx", "r", encoding="utf-8") as f:
+            offsets = {e["tick"]: e["offset"] for e in map(json.loads, f)}
+        if seek not in offsets:
+            if tick is not None:
+                return
+            later = [t for t in offsets if t >= seek]
+            if not later:
+                return
+            seek = min(later)
+        offset = offsets[seek]
+    with opener(path, "rb") as f:
+        f.seek(offset)
+        for raw in f:
+            rec = json.loads(raw)
+            if start_tick is not None and rec.get("tick") < start_tick:
+                continue
+            if tick is not None and rec.get("tick") != tick:
+                if rec.get("tick", tick) > tick:
+                    break
+                continue
+            yield rec
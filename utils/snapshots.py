@@ -0,0 +1,181 @@
+# utils/snapshots.py
+import copy, hashlib, json
+
+CELL_LISTS = ("fires", "rubble")
+
+
+def _row_major(cell):
+    return (cell[1], cell[0])
+
+
+class SnapshotEncoder:
+    """
+    Encodes successive summarize_state() dicts as a full keyframe every
+    `keyframe_every` ticks and compact deltas in between:
+      agents:    {"upd": {id: {changed fields}}, "unset": {id: [removed fields]},
+                  "add": [agent], "del": [id]}
+      fires/rubble: {"add": [[x,y]], "del": [[x,y]]}
+      survivors: {"shift": k (added to every deadline), "upd": {id: {fields}},
+                  "unset": {id: [fields]}, "add": [survivor], "del": [id]}
+      hospitals: full list, only when a queue length changed
+      set:       any other top-level key whose value changed
+    SnapshotDecoder rebuilds the exact state from a keyframe plus deltas.
+    """
+    def __init__(self, keyframe_every: int = 50):
+        self.keyframe_every = max(1, int(keyframe_every))
+        self._prev = None
+        self._n = 0
+
+    def encode(self, state):
+        """Return {"snap": "key", "state": ...} or {"snap": "delta", "delta": ...}."""
+        key = self._prev is None or self._n % self.keyframe_every == 0
+        self._n += 1
+        if key:
+            self._prev = copy.deepcopy(state)
+            return {"snap": "key", "state": state}
+        delta = diff_states(self._prev, state)
+        self._prev = copy.deepcopy(state)
+        return {"snap": "delta", "delta": delta}
+
+
+def _diff_by_id(prev, cur):
+    prev_by = {e["id"]: e for e in prev}
+    cur_ids = {e["id"] for e in cur}
+    out = {}
+    dels = [i for i in prev_by if i not in cur_ids]
+    adds = [e for e in cur if e["id"] not in prev_by]
+    upd, unset = {}, {}
+    for e in cur:
+        p = prev_by.get(e["id"])
+        if p is not None and p != e:
+            changed = {k: v for k, v in e.items() if k not in p or p[k] != v}
+            gone = [k for k in p if k not in e]
+            if changed: upd[e["id"]] = changed
+            if gone: unset[e["id"]] = gone
+    if dels: out["del"] = dels
+    if adds: out["add"] = adds
+    if upd: out["upd"] = upd
+    if unset: out["unset"] = unset
+    return out
+
+
+def diff_states(prev, cur):
+    delta = {}
+    for key in CELL_LISTS:
+        a = {tuple(c) for c in prev.get(key, [])}
+        b = {tuple(c) for c in cur.get(key, [])}
+        d = {}
+        if b - a: d["add"] = [list(c) for c in sorted(b - a, key=_row_major)]
+        if a - b: d["del"] = [list(c) for c in sorted(a - b, key=_row_major)]
+        if d: delta[key] = d
+
+    agents = _diff_by_id(prev.get("agents", []), cur.get("agents", []))
+    if agents: delta["agents"] = agents
+
+    # survivor deadlines all tick down together: send the common shift, not every survivor
+    prev_s = {s["id"]: s for s in prev.get("survivors", [])}
+    shifts = [s["deadline"] - prev_s[s["id"]]["deadline"] for s in cur.get("survivors", [])
+              if s["id"] in prev_s and isinstance(s.get("deadline"), (int, float))
+              and isinstance(prev_s[s["id"]].get("deadline"), (int, float))]
+    shift = max(set(shifts), key=shifts.count) if shifts else 0
+    shifted = [dict(s, deadline=s["deadline"] + shift) if isinstance(s.get("deadline"), (int, float)) else s
+               for s in prev.get("survivors", [])]
+    surv = _diff_by_id(shifted, cur.get("survivors", []))
+    if shift: surv["shift"] = shift
+    if surv: delta["survivors"] = surv
+
+    if prev.get("hospitals") != cur.get("hospitals"):
+        delta["hospitals"] = cur.get("hospitals")
+
+    other = {k: v for k, v in cur.items()
+             if k not in CELL_LISTS + ("agents", "survivors", "hospitals") and prev.get(k) != v}
+    gone = [k for k in prev if k not in cur]
+    if other: delta["set"] = other
+    if gone: delta["unset"] = gone
+    return delta
+
+
+def _apply_by_id(entries, d):
+    dels = set(d.get("del", []))
+    out = []
+    for e in entries:
+        if e["id"] in dels:
+            continue
+        upd = d.get("upd", {}).get(e["id"])
+        gone = d.get("unset", {}).get(e["id"])
+        if upd or gone:
+            e = dict(e, **(upd or {}))
+            for k in gone or ():
+                e.pop(k, None)
+        out.append(e)
+    out.extend(copy.deepcopy(d.get("add", [])))
+    return out
+
+
+def apply_delta(state, delta):
+    """New state = `state` with `delta` applied (the input is not modified)."""
+    state = copy.deepcopy(state)
+    for key in CELL_LISTS:
+        d = delta.get(key)
+        if d:
+            cells = {tuple(c) for c in state.get(key, [])}
+            cells -= {tuple(c) for c in d.get("del", [])}
+            cells |= {tuple(c) for c in d.get("add", [])}
+            state[key] = [list(c) for c in sorted(cells, key=_row_major)]
+    if "agents" in delta:
+        state["agents"] = _apply_by_id(state.get("agents", []), delta["agents"])
+    if "survivors" in delta:
+        d = delta["survivors"]
+        shift = d.get("shift", 0)
+        survivors = state.get("survivors", [])
+        if shift:
+            survivors = [dict(s, deadline=s["deadline"] + shift) if isinstance(s.get("deadline"), (int, float)) else s
+                         for s in survivors]
+        state["survivors"] = _apply_by_id(survivors, d)
+    if "hospitals" in delta:
+        state["hospitals"] = copy.deepcopy(delta["hospitals"])
+    for k, v in delta.get("set", {}).items():
+        state[k] = copy.deepcopy(v)
+    for k in delta.get("unset", []):
+        state.pop(k, None)
+    return state
+
+
+class SnapshotDecoder:
+    """Feed encoded records in tick order; `state` is the rebuilt state after each one."""
+    def __init__(self):
+        self.state = None
+
+    def apply(self, record):
+        if record["snap"] == "key":
+            self.state = copy.deepcopy(record["state"])
+        elif self.state is None:
+            raise ValueError("delta before the first keyframe")
+        else:
+            self.state = apply_delta(self.state, record["delta"])
+        return self.state
+
+
+def state_at(log_path, tick):
+    """Rebuild the world state of `tick` from a RunLogger stream written with delta snapshots."""
+    from utils.jsonl_logger import read_run_log
+    every = None
+    for rec in read_run_log(log_path, tick=-1):
+        every = rec.get("keyframe_every")
+    start = tick - tick % every if every else None
+    dec = SnapshotDecoder()
+    for rec in read_run_log(log_path, start_tick=start):
+        if rec.get("type") != "state":
+            continue
+        if rec["tick"] > tick:
+            break
+        dec.apply(rec)
+        if rec["tick"] == tick:
+            return dec.state
+    return None
+
+
+def state_hash(state):
+    """sha1 of the canonical JSON of a summarize_state() dict; used to verify replays tick by tick."""
+    blob = json.dumps(state, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()